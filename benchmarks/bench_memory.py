@@ -0,0 +1,127 @@
+'''Measures the memory used by each Link, PartialNavigator and
+HALNavigator object, with their __slots__ and, under `without_slots`,
+with their attributes in a __dict__ as before they had __slots__.
+Those instances still have their empty slots too, a pointer each.
+Prints the results as JSON.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_memory [--count N]
+'''
+
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import tracemalloc
+
+import six
+
+import restnavigator.halnav as HN
+
+ROOT = 'http://bench.example/api/'
+
+
+def _bytes_per_object(factory, count):
+    '''Returns the average number of bytes allocated and retained by
+    each object created by `factory`'''
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(
+        stat.size_diff for stat in after.compare_to(before, 'filename'))
+    # Don't count the list holding the objects
+    allocated -= objects.__sizeof__()
+    del objects
+    return allocated / float(count)
+
+
+class _DictAttribute(object):
+    '''Stores an attribute in the __dict__ of instances, overriding the
+    slot descriptor of the same name'''
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+
+    def __delete__(self, obj):
+        try:
+            del obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+
+def _unslotted(cls):
+    '''Returns a subclass of `cls` whose instances keep the attributes
+    declared in __slots__ in their __dict__ instead, like instances of
+    classes without __slots__'''
+    names = set()
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get('__slots__', ())
+        if isinstance(slots, six.string_types):
+            slots = (slots,)
+        names.update(slots)
+    names.difference_update(['__dict__', '__weakref__'])
+    return type('Unslotted' + cls.__name__, (cls,),
+                dict((name, _DictAttribute(name)) for name in names))
+
+
+def _make_uris(count):
+    '''Creates the uris up front, so their memory isn't counted'''
+    return [ROOT + 'things/' + str(i) for i in range(count)]
+
+
+def _measure(count, link_class, partial_class, nav_class):
+    core = HN.APICore(root=ROOT, nav_class=nav_class)
+    uris = _make_uris(count)
+    links = [HN.Link(uri) for uri in uris]
+    template = HN.Link(ROOT + 'things/{id}', {'templated': True})
+    return {
+        'link': _bytes_per_object(
+            lambda i: link_class(uris[i], {'href': uris[i]}), count),
+        'partial_navigator': _bytes_per_object(
+            lambda i: partial_class(template, core=core), count),
+        # Includes the identity map entry and the empty link and
+        # embedded dictionaries every navigator has
+        'hal_navigator': _bytes_per_object(
+            lambda i: nav_class(links[i], core), count),
+    }
+
+
+def run(count=20000):
+    results = _measure(
+        count, HN.Link, HN.PartialNavigator, HN.HALNavigator)
+    results['count'] = count
+    results['without_slots'] = _measure(
+        count,
+        _unslotted(HN.Link),
+        _unslotted(HN.PartialNavigator),
+        _unslotted(HN.HALNavigator),
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=20000,
+                        help='number of objects of each kind to create')
+    args = parser.parse_args()
+    print(json.dumps(run(args.count), indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
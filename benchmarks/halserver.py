@@ -0,0 +1,167 @@
+'''A local stand-in for a HAL api, to run benchmarks against.
+
+Every path is a resource. The document at a path has a link for each
+rel the server knows about, pointing to the path extended with that rel,
+so any sequence of rels can be traversed from any start path. Responses
+carry an ETag and can be given a max-age, a size and a delay. Other
+shapes of documents can be served by passing a `documents` function.
+
+Run from the repository root with:
+
+    python -m benchmarks.halserver --rel orders --rel customer [--port N]
+'''
+
+from __future__ import print_function
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import quote, urlsplit
+
+
+class HALServer(ThreadingMixIn, HTTPServer):
+    '''Serves generated HAL documents in a thread per request.
+
+    `rels` are the link relations each document has, `max_age` is sent
+    in a Cache-Control header if given, `payload` is the number of
+    bytes of padding added to the state of each document and `latency`
+    is the number of seconds to wait before answering. If `etags` is
+    False, responses have no ETag and are always sent in full.
+
+    `documents` replaces the generated documents: it is called with
+    the path and returns the document, or None for a 404.
+    '''
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0), rels=(), max_age=None,
+                 payload=0, latency=0.0, etags=True, documents=None):
+        HTTPServer.__init__(self, address, HALRequestHandler)
+        self.rels = sorted(set(rels))
+        self.max_age = max_age
+        self.payload = payload
+        self.latency = latency
+        self.etags = etags
+        self.documents = documents
+        self.requests = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def root(self):
+        host, port = self.server_address[:2]
+        return 'http://{0}:{1}/'.format(host, port)
+
+    def local_uri(self, uri):
+        '''Maps a uri of the real api onto this server by keeping only
+        its path and query'''
+        parts = urlsplit(uri)
+        path = parts.path.lstrip('/')
+        if parts.query:
+            path += '?' + parts.query
+        return self.root + path
+
+    def document(self, path):
+        if self.documents is not None:
+            return self.documents(path)
+        base = path.split('?', 1)[0].rstrip('/')
+        links = {'self': {'href': path}}
+        for rel in self.rels:
+            links[rel] = {'href': base + '/' + quote(rel, safe='')}
+        return {
+            '_links': links,
+            'path': path,
+            'padding': 'x' * self.payload,
+        }
+
+    def count(self, not_modified):
+        with self._lock:
+            self.requests += 1
+            if not_modified:
+                self.not_modified += 1
+
+    def start(self):
+        '''Serves in a background thread. Returns the server'''
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class HALRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, which would otherwise
+    # wait for delayed acks on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        document = server.document(self.path)
+        if document is None:
+            server.count(False)
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps(document).encode('utf-8')
+        etag = None
+        if server.etags:
+            etag = '"{0}"'.format(hashlib.sha1(body).hexdigest())
+        not_modified = etag is not None \
+            and self.headers.get('If-None-Match') == etag
+        server.count(not_modified)
+        self.send_response(304 if not_modified else 200)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        if server.max_age is not None:
+            self.send_header(
+                'Cache-Control', 'max-age={0}'.format(server.max_age))
+        if not_modified:
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_header('Content-Type', 'application/hal+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--rel', action='append', default=[],
+                        help='a link relation every document has')
+    parser.add_argument('--max-age', type=int, default=None)
+    parser.add_argument('--payload', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+    server = HALServer(('127.0.0.1', args.port), args.rel, args.max_age,
+                       args.payload, args.latency)
+    print('Serving on', server.root)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
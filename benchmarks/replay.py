@@ -0,0 +1,221 @@
+'''Replays a log of traversals through HALNavigators against a local
+stand-in server, and prints throughput, latency percentiles and cache
+hit rates as JSON.
+
+The log has one JSON object per line, with the unix timestamp of the
+traversal, the uri it started at and the rels it followed:
+
+    {"ts": 1700000000.25, "start": "https://api.example/orders", "rels": ["ht:customer"]}
+
+Traversals are started at their original pace, scaled by `--speed`
+(2 replays twice as fast, 0 as fast as possible). Only the path and
+query of the start uris are kept, so production logs can be replayed
+as they are. Run from the repository root with:
+
+    python -m benchmarks.replay access.jsonl [--speed S] [--concurrency N]
+'''
+
+from __future__ import division, print_function
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import restnavigator.halnav as HN
+from restnavigator import cache
+from benchmarks.halserver import HALServer
+
+
+def read_log(lines):
+    '''Parses the lines of a log into (ts, start, rels) tuples sorted
+    by timestamp. Blank lines are skipped'''
+    records = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        records.append((
+            float(record.get('ts', 0)),
+            record['start'],
+            tuple(record.get('rels', ())),
+        ))
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    '''Returns the given percentiles of the samples, in milliseconds,
+    using the nearest rank'''
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        if ordered:
+            rank = max(0, int(round(point / 100 * len(ordered))) - 1)
+            result['p{0}'.format(point)] = ordered[rank] * 1000
+        else:
+            result['p{0}'.format(point)] = None
+    return result
+
+
+class Replayer(object):
+    '''Replays traversals through navigators sharing one api, so the
+    identity map and the response cache behave as they would in a long
+    running process'''
+
+    def __init__(self, server, concurrency=8, cache_size=None,
+                 default_ttl=None, id_map=None):
+        self.server = server
+        session = requests.Session()
+        session.headers.update(HN.DEFAULT_HEADERS)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+        session.mount('http://', adapter)
+        session.hooks['response'].append(self._record_response)
+        self.concurrency = concurrency
+        self.core = HN.APICore(
+            root=server.root,
+            nav_class=HN.HALNavigator,
+            session=session,
+            response_cache=None if cache_size is None
+            else cache.ResponseCache(maxsize=cache_size),
+            default_ttl=default_ttl,
+            id_map=id_map,
+        )
+        self._lock = threading.Lock()
+        self.request_latencies = []
+        self.traversal_latencies = []
+        self.errors = 0
+
+    def _record_response(self, response, *args, **kwargs):
+        with self._lock:
+            self.request_latencies.append(
+                response.elapsed.total_seconds())
+
+    def traverse(self, start, rels):
+        began = time.time()
+        try:
+            nav = self.core.nav_class(
+                HN.Link(self.server.local_uri(start)), self.core)
+            if rels:
+                nav = nav[rels]
+            nav(copy=False)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+        finally:
+            elapsed = time.time() - began
+            with self._lock:
+                self.traversal_latencies.append(elapsed)
+
+    def run(self, records, speed=1.0):
+        if not records:
+            return self.report(0.0)
+        first = records[0][0]
+        began = time.time()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for ts, start, rels in records:
+                if speed:
+                    delay = began + (ts - first) / speed - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                executor.submit(self.traverse, start, rels)
+        return self.report(time.time() - began)
+
+    def report(self, duration):
+        core_stats = self.core.stats()
+        stats = core_stats['response_cache']
+        gets = stats['hits'] + stats['revalidations'] + stats['misses']
+        traversals = len(self.traversal_latencies)
+        requests_made = len(self.request_latencies)
+        return {
+            'duration': duration,
+            'traversals': traversals,
+            'requests': requests_made,
+            'errors': self.errors,
+            'traversals_per_second':
+                traversals / duration if duration else None,
+            'requests_per_second':
+                requests_made / duration if duration else None,
+            'traversal_latency_ms': percentiles(self.traversal_latencies),
+            'request_latency_ms': percentiles(self.request_latencies),
+            'response_cache': dict(
+                stats,
+                hit_rate=stats['hits'] / gets if gets else None,
+                revalidation_rate=(
+                    stats['revalidations'] / gets if gets else None),
+            ),
+            'id_map': core_stats['id_map'],
+            'server': {
+                'requests': self.server.requests,
+                'not_modified': self.server.not_modified,
+            },
+        }
+
+
+def replay(records, speed=1.0, concurrency=8, cache_size=None,
+           default_ttl=None, max_age=None, payload=0, latency=0.0,
+           id_map=None):
+    '''Starts a stand-in server knowing every rel in the records,
+    replays them against it and returns the report'''
+    rels = set()
+    for _, _, record_rels in records:
+        rels.update(record_rels)
+    server = HALServer(rels=rels, max_age=max_age, payload=payload,
+                       latency=latency).start()
+    try:
+        replayer = Replayer(
+            server, concurrency, cache_size, default_ttl, id_map)
+        return replayer.run(records, speed)
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('log', type=argparse.FileType('r'),
+                        help='JSONL file of traversals, - for stdin')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='factor to scale the original pace by, '
+                             '0 to replay as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--cache-size', type=int, default=None,
+                        help='size of the response cache of the api')
+    parser.add_argument('--default-ttl', type=float, default=None)
+    parser.add_argument('--max-age', type=int, default=None,
+                        help='max-age the stand-in server sends')
+    parser.add_argument('--payload', type=int, default=0,
+                        help='bytes of padding in each document')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the stand-in server waits per request')
+    parser.add_argument('--id-map-size', type=int, default=None,
+                        help='keep this many navigators in an LRU identity '
+                             'map instead of a weak one')
+    parser.add_argument('--id-map-ttl', type=float, default=None,
+                        help='seconds navigators stay in the LRU identity map')
+    args = parser.parse_args()
+    id_map = None
+    if args.id_map_size is not None or args.id_map_ttl is not None:
+        id_map = cache.LRUIdentityMap(
+            maxsize=args.id_map_size or cache.LRUIdentityMap.DEFAULT_MAXSIZE,
+            ttl=args.id_map_ttl,
+        )
+    records = read_log(args.log)
+    print(json.dumps(replay(
+        records,
+        speed=args.speed,
+        concurrency=args.concurrency,
+        cache_size=args.cache_size,
+        default_ttl=args.default_ttl,
+        max_age=args.max_age,
+        payload=args.payload,
+        latency=args.latency,
+        id_map=id_map,
+    ), indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
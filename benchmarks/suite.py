@@ -0,0 +1,230 @@
+'''Measures the hot paths of HALNavigators against an in-process HAL
+server, and prints the results as JSON.
+
+The server serves documents of four shapes:
+
+- wide: a document with many rels and a long list of links
+- deep: a document with embedded documents nested many levels deep
+- chain: a long chain of pages linked by next
+- large: a document with a large state
+
+For each shape, the suite measures full fetches per second and the time
+to ingest a megabyte of the response. It also measures the latency of
+each hop when walking the chain and of traversing the embedded
+documents, and the memory used per navigator of the chain. Run from the
+repository root with:
+
+    python -m benchmarks.suite [--width N] [--depth N] [--length N]
+                               [--size-kb N] [--repeat N]
+'''
+
+from __future__ import division, print_function
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+import requests
+
+import restnavigator.halnav as HN
+from benchmarks import bench_memory
+from benchmarks.halserver import HALServer
+
+SHAPES = ('wide', 'deep', 'chain', 'large')
+
+
+class Shapes(object):
+    '''Generates the documents of each shape by path'''
+
+    def __init__(self, width=500, depth=20, length=200, size_kb=512):
+        self.width = width
+        self.depth = depth
+        self.length = length
+        self.size_kb = size_kb
+
+    def __call__(self, path):
+        parts = path.strip('/').split('/')
+        shape = parts[0]
+        if shape == 'wide':
+            return self.wide()
+        elif shape == 'deep':
+            return self.deep()
+        elif shape == 'chain':
+            index = int(parts[1]) if len(parts) > 1 else 0
+            return self.chain(index) if index < self.length else None
+        elif shape == 'large':
+            return self.large()
+
+    def wide(self):
+        links = {'self': {'href': '/wide'}}
+        for i in range(self.width):
+            links['rel{0}'.format(i)] = {'href': '/wide/rel/{0}'.format(i)}
+        links['item'] = [{'href': '/wide/item/{0}'.format(i)}
+                         for i in range(self.width)]
+        return {'_links': links, 'width': self.width}
+
+    def deep(self):
+        doc = {'_links': {'self': {'href': '/deep/0'}}, 'level': 0}
+        parent = doc
+        for level in range(1, self.depth + 1):
+            child = {
+                '_links': {'self': {'href': '/deep/{0}'.format(level)}},
+                'level': level,
+            }
+            parent['_embedded'] = {'child': child}
+            parent = child
+        return doc
+
+    def chain(self, index):
+        links = {'self': {'href': '/chain/{0}'.format(index)}}
+        if index + 1 < self.length:
+            links['next'] = {'href': '/chain/{0}'.format(index + 1)}
+        return {'_links': links, 'index': index}
+
+    def large(self):
+        # Records of about 100 bytes each once encoded
+        records = [
+            {'id': i, 'name': 'record {0}'.format(i), 'active': i % 2 == 0,
+             'score': i * 0.5, 'tags': ['a', 'b', 'c']}
+            for i in range(self.size_kb * 10)
+        ]
+        return {'_links': {'self': {'href': '/large'}}, 'records': records}
+
+
+def _core(root, session):
+    return HN.APICore(root=root, nav_class=HN.HALNavigator, session=session)
+
+
+def _nav(core, path):
+    return core.nav_class(HN.Link(core.root + path.lstrip('/')), core)
+
+
+def fetch_throughput(session, root, shape, repeat):
+    '''Full GETs per second of the document of a shape'''
+    nav = _nav(_core(root, session), shape)
+    began = time.time()
+    for _ in range(repeat):
+        nav.fetch(use_cache=False, copy=False)
+    return repeat / (time.time() - began)
+
+
+def ingest_ms_per_mb(session, root, shape, repeat):
+    '''Milliseconds spent ingesting a megabyte of the response of a
+    shape, including the creation of its link and embedded navigators'''
+    response = session.get(root + shape)
+    megabytes = len(response.content) / (1024 * 1024)
+    elapsed = 0.0
+    for _ in range(repeat):
+        nav = _nav(_core(root, session), shape)
+        began = time.time()
+        nav._ingest_response(response)
+        list(nav._links.values())
+        list(nav._embedded.values())
+        elapsed += time.time() - began
+    return elapsed / repeat / megabytes * 1000
+
+
+def chain_hop_ms(session, root, length):
+    '''Average milliseconds per page when walking the chain'''
+    nav = _nav(_core(root, session), '/chain/0')
+    began = time.time()
+    pages = sum(1 for _ in nav.iter_pages())
+    assert pages == length, pages
+    return (time.time() - began) / pages * 1000
+
+
+def deep_traversal_ms(session, root, depth, repeat):
+    '''Milliseconds to fetch the deep document and traverse its embedded
+    documents down to the bottom'''
+    traversal = ('child',) * depth
+    elapsed = 0.0
+    for _ in range(repeat):
+        nav = _nav(_core(root, session), '/deep')
+        began = time.time()
+        bottom = nav[traversal]
+        elapsed += time.time() - began
+        assert bottom.state['level'] == depth
+    return elapsed / repeat * 1000
+
+
+def chain_bytes_per_navigator(session, root, length):
+    '''Memory retained per fetched navigator of the chain, including
+    its state and links'''
+    core = _core(root, session)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    pages = list(_nav(core, '/chain/0').iter_pages())
+    for page in pages:
+        page.response = None  # don't count the raw responses
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(
+        stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return (allocated - pages.__sizeof__()) / len(pages)
+
+
+def run(width=500, depth=20, length=200, size_kb=512, repeat=20):
+    shapes = Shapes(width, depth, length, size_kb)
+    server = HALServer(etags=False, documents=shapes).start()
+    session = requests.Session()
+    session.headers.update(HN.DEFAULT_HEADERS)
+    try:
+        root = server.root
+        results = {
+            'config': {
+                'width': width,
+                'depth': depth,
+                'length': length,
+                'size_kb': size_kb,
+                'repeat': repeat,
+            },
+            'fetches_per_second': dict(
+                (shape, fetch_throughput(session, root, shape, repeat))
+                for shape in SHAPES),
+            'ingest_ms_per_mb': dict(
+                (shape, ingest_ms_per_mb(session, root, shape, repeat))
+                for shape in SHAPES),
+            'traversal_ms': {
+                'chain_hop': chain_hop_ms(session, root, length),
+                'deep': deep_traversal_ms(session, root, depth, repeat),
+            },
+            'memory_bytes': dict(
+                bench_memory.run(count=2000),
+                chain_navigator=chain_bytes_per_navigator(
+                    session, root, length),
+            ),
+        }
+    finally:
+        session.close()
+        server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=500,
+                        help='number of rels and of listed links')
+    parser.add_argument('--depth', type=int, default=20,
+                        help='levels of embedded documents')
+    parser.add_argument('--length', type=int, default=200,
+                        help='number of pages in the chain')
+    parser.add_argument('--size-kb', type=int, default=512,
+                        help='approximate size of the large document')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='repetitions of each measurement')
+    args = parser.parse_args()
+    print(json.dumps(run(
+        width=args.width,
+        depth=args.depth,
+        length=args.length,
+        size_kb=args.size_kb,
+        repeat=args.repeat,
+    ), indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
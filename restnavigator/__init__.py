@@ -2,6 +2,7 @@ __version__ = '1.0.3'
 
 try:
     from .halnav import Navigator  # NOQA
+    from .crawler import crawl  # NOQA
 except ImportError:
     # for setup.py and docs
     pass
@@ -0,0 +1,337 @@
+'''asyncio support for navigating HAL apis. Requires python 3.6 or later.
+
+Create navigators with `restnavigator.Navigator.hal_async`.
+'''
+
+import asyncio
+import datetime
+import functools
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import six
+
+from restnavigator import exc, utils
+from restnavigator.halnav import (
+    DELETE, GET, PATCH, POST, PUT, HALNavigatorBase, _timer)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def _running_loop():
+    '''Returns the event loop running the current coroutine'''
+    get_running_loop = getattr(asyncio, 'get_running_loop', None)
+    if get_running_loop is None:  # pragma: nocover
+        return asyncio.get_event_loop()  # python 3.6
+    return get_running_loop()
+
+
+class AsyncTransport(object):
+    '''Performs the http requests of AsyncHALNavigators.
+
+    Subclasses implement `request`, which takes the same arguments as
+    `requests.Session.request` and must return a `requests.Response`.
+    The headers, authentication and cookies of `core.session` should
+    be honored, as well as `core.rate_limiter` and `core.retry_policy`
+    if there are any. `timings` is filled like in `APICore.request`
+    when it is given.
+    '''
+
+    async def request(self, core, method, uri, timings=None, **kwargs):
+        raise NotImplementedError
+
+    async def close(self):
+        '''Releases any resources held by the transport'''
+        pass
+
+
+class ThreadedTransport(AsyncTransport):
+    '''Makes blocking requests with the session of the api in a pool
+    of threads, so it works with any session the synchronous navigators
+    work with.
+
+    For many concurrent requests, mount a `requests.adapters.HTTPAdapter`
+    with a `pool_maxsize` of at least `max_workers` on the session, or
+    connections will be discarded instead of reused.
+    '''
+
+    def __init__(self, max_workers=32, executor=None):
+        self.max_workers = max_workers
+        self._executor = executor
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def request(self, core, method, uri, timings=None, **kwargs):
+        loop = _running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(
+                core.request, method, uri, timings=timings, **kwargs),
+        )
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+class AiohttpTransport(AsyncTransport):
+    '''Makes requests natively on the event loop with aiohttp, which
+    must be installed.
+
+    Requests are prepared by the session of the api, so its headers,
+    cookies and authentication are sent along, and the aiohttp response
+    is converted to a `requests.Response`.
+    '''
+
+    def __init__(self, client_session=None, limit=100):
+        if aiohttp is None:
+            raise ImportError('AiohttpTransport requires aiohttp')
+        self._client = client_session
+        self.limit = limit
+
+    async def request(self, core, method, uri, timings=None, **kwargs):
+        limiter = core.rate_limiter
+        if limiter is None and core.retry_policy is None:
+            if timings is not None:
+                timings.update(
+                    throttle=0.0, retry=0.0, attempt_started=_timer())
+            return await self._send(core, method, uri, **kwargs)
+        attempts = core.new_attempts()
+        throttle = retry = 0.0
+        while True:
+            began = _timer()
+            if limiter is not None:
+                delay = limiter.reserve(uri)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            attempt_started = _timer()
+            throttle += attempt_started - began
+            try:
+                response = await self._send(core, method, uri, **kwargs)
+            except Exception as e:
+                delay = core.retry_delay(method, uri, attempts, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = core.retry_delay(method, uri, attempts, response)
+                if delay is None:
+                    if timings is not None:
+                        timings.update(throttle=throttle, retry=retry,
+                                       attempt_started=attempt_started)
+                    return response
+            if delay > 0:
+                await asyncio.sleep(delay)
+            retry += _timer() - attempt_started
+
+    async def _send(self, core, method, uri, **kwargs):
+        if self._client is None:
+            self._client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit))
+        allow_redirects = kwargs.pop('allow_redirects', True)
+        prepared = core.session.prepare_request(
+            requests.Request(method, uri, **kwargs))
+        sent = _timer()
+        async with self._client.request(
+                prepared.method,
+                prepared.url,
+                headers=dict(prepared.headers),
+                data=prepared.body,
+                allow_redirects=allow_redirects,
+        ) as resp:
+            # Like requests, elapsed is the time until the headers
+            # were received
+            elapsed = datetime.timedelta(seconds=_timer() - sent)
+            content = await resp.read()
+        response = requests.Response()
+        response.status_code = resp.status
+        response.reason = resp.reason
+        response.headers = requests.structures.CaseInsensitiveDict(
+            resp.headers)
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers)
+        response.url = str(resp.url)
+        response.request = prepared
+        response._content = content
+        response.elapsed = elapsed
+        self._extract_cookies(core, resp, response)
+        return response
+
+    @staticmethod
+    def _extract_cookies(core, resp, response):
+        '''Stores the cookies set by an aiohttp response in the session
+        of the api and in the converted response, as requests does'''
+        cookies = resp.headers.getall('Set-Cookie', ())
+        if not cookies:
+            return
+        message = http.client.HTTPMessage()
+        for cookie in cookies:
+            message['Set-Cookie'] = cookie
+        mock_response = requests.cookies.MockResponse(message)
+        mock_request = requests.cookies.MockRequest(response.request)
+        response.cookies.extract_cookies(mock_response, mock_request)
+        core.session.cookies.extract_cookies(mock_response, mock_request)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class AsyncHALNavigator(HALNavigatorBase):
+    '''A navigator whose requests are coroutines.
+
+    It behaves like a HALNavigator, except that calling it, fetching
+    it, following its links with brackets and its http methods must
+    all be awaited. Navigators obtained from it are AsyncHALNavigators
+    as well. OrphanHALNavigators resulting from non-GET requests already
+    have their state and can be called without awaiting.
+    '''
+
+    __slots__ = ()
+
+    async def __call__(self, raise_exc=True, copy=True):
+        if not self.resolved:
+            return await self.fetch(raise_exc=raise_exc, copy=copy)
+        else:
+            return self._get_state(copy)
+
+    def __iter__(self):
+        raise TypeError('AsyncHALNavigator must be iterated with async for')
+
+    async def __aiter__(self):
+        '''Follows the next links of this navigator'''
+        yield self
+        last = self
+        while True:
+            try:
+                current = await last.next()
+            except StopAsyncIteration:
+                return
+            await current(copy=False)  # fetch if necessary
+            yield current
+            last = current
+
+    async def next(self):
+        try:
+            return await self['next']
+        except exc.OffTheRailsException as otre:
+            if isinstance(otre.exception, KeyError):
+                raise StopAsyncIteration()
+            else:
+                raise
+
+    async def links(self):
+        '''Returns a dictionary of navigators from the current
+        resource. Fetches the resource if necessary.
+        '''
+        if not self.resolved:
+            await self.fetch()
+        return self._links
+
+    async def embedded(self):
+        '''Returns a dictionary of navigators representing embedded
+        documents in the current resource. Fetches the resource if
+        necessary.
+        '''
+        if not self.resolved:
+            await self.fetch()
+        return self._embedded
+
+    def __getitem__(self, getitem_args):
+        r'''Rel selector and traversor for navigators. Returns an
+        awaitable'''
+        return self._traverse(getitem_args)
+
+    async def _traverse(self, getitem_args):
+        traversal = utils.normalize_getitem_args(getitem_args)
+        intermediates = [self]
+        val = self
+        for i, arg in enumerate(traversal):
+            try:
+                if isinstance(arg, six.string_types):
+                    if not val.resolved:
+                        await val.fetch()
+                    if val._embedded and arg in val._embedded:
+                        val = val._embedded[arg]
+                    else:
+                        # We're hoping it's in links, otherwise we're
+                        # off the tracks
+                        val = val._links[arg]
+                elif isinstance(arg, tuple):
+                    val = val.get_by(*arg, raise_exc=True)
+                elif isinstance(arg, int) and isinstance(val, list):
+                    val = val[arg]
+                else:
+                    raise TypeError("{0!r} doesn't accept a traversor of {1!r}"
+                                    .format(val, arg))
+            except Exception as e:
+                raise exc.OffTheRailsException(
+                    traversal, i, intermediates, e)
+            intermediates.append(val)
+        return val
+
+    async def _request(self, method, body=None, raise_exc=True,
+                       headers=None, files=None):
+        '''Fetches HTTP response using the passed http method through
+        the transport of the api. Raises HALNavigatorError if response
+        is in the 400-500 range.'''
+        request_kwargs, entry = self._prepare_request(
+            method, body, headers, files)
+        info = self._request_started(method)
+        timings = None if info is None else {}
+        try:
+            response = await self._core.transport.request(
+                self._core, method, self.uri, timings=timings,
+                **request_kwargs)
+        except Exception as e:
+            if info is not None:
+                self._request_failed(info, e)
+            raise
+        return self._handle_response(
+            response, entry, raise_exc, info, timings)
+
+    async def fetch(self, raise_exc=True, use_cache=True, copy=True):
+        '''Performs a GET request to the uri of this navigator.
+
+        If the resource was fetched before and its response is still
+        fresh, the cached state is returned without a request, unless
+        `use_cache` is False. If `copy` is False, a read-only view of
+        the state is returned instead of a copy.
+        '''
+        entry = self._fresh_entry(use_cache)
+        if entry is not None:
+            self._ingest_cached(entry)
+        else:
+            await self._request(GET, raise_exc=raise_exc)  # ingests response
+        self.fetched = True
+        return self._get_state(copy)
+
+    async def create(self, body=None, raise_exc=True, headers=None, **kwargs):
+        '''Performs an HTTP POST to the server, to create a
+        subordinate resource. Returns a new AsyncHALNavigator
+        representing that resource.
+        '''
+        return await self._request(POST, body, raise_exc, headers, **kwargs)
+
+    async def delete(self, raise_exc=True, headers=None, files=None):
+        '''Performs an HTTP DELETE to the server, to delete resource(s).'''
+        return await self._request(DELETE, None, raise_exc, headers, files)
+
+    async def upsert(self, body, raise_exc=True, headers=False, files=None):
+        '''Performs an HTTP PUT to the server, to create or update the
+        resource this navigator is pointing to.'''
+        return await self._request(PUT, body, raise_exc, headers, files)
+
+    async def patch(self, body, raise_exc=True, headers=False, files=None):
+        '''Performs an HTTP PATCH to the server, to update all or a
+        portion of the resource this navigator is pointing to.'''
+        return await self._request(PATCH, body, raise_exc, headers, files)
@@ -0,0 +1,718 @@
+'''Caching of fetched resources shared between navigators of an api'''
+
+from __future__ import unicode_literals
+
+from email.utils import mktime_tz, parsedate_tz
+import json
+import threading
+import time
+from weakref import WeakValueDictionary
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # pragma: nocover
+    ThreadPoolExecutor = None
+try:
+    import sqlite3
+except ImportError:  # pragma: nocover
+    sqlite3 = None
+
+import requests
+try:
+    from collections import OrderedDict
+except ImportError:  # pragma: nocover
+    from ordereddict import OrderedDict
+
+
+def parse_cache_control(header):
+    '''Parses a Cache-Control header into a dictionary of lowercased
+    directives. Directives without a value map to None'''
+    directives = {}
+    for directive in (header or '').split(','):
+        name, _, value = directive.partition('=')
+        name = name.strip().lower()
+        if name:
+            directives[name] = value.strip().strip('"') or None
+    return directives
+
+
+def parse_http_date(value):
+    '''Parses an http date into a unix timestamp. Returns None if the
+    date can't be parsed'''
+    parsed = parsedate_tz(value) if value else None
+    if parsed is None:
+        return None
+    return mktime_tz(parsed)
+
+
+def freshness_lifetime(headers, default_ttl=None):
+    '''Returns the number of seconds a response with the given headers
+    stays fresh, taking into account how long it has already spent in
+    upstream caches. Returns None if the response may not be stored at
+    all.
+
+    Cache-Control takes precedence over Expires. If neither is given,
+    `default_ttl` is used.
+    '''
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+    if 'max-age' in directives:
+        try:
+            lifetime = int(directives['max-age'])
+        except (TypeError, ValueError):
+            lifetime = 0
+    elif 'Expires' in headers:
+        expires = parse_http_date(headers['Expires'])
+        date = parse_http_date(headers.get('Date')) or time.time()
+        lifetime = expires - date if expires is not None else 0
+    else:
+        lifetime = default_ttl or 0
+    try:
+        age = int(headers.get('Age', 0))
+    except ValueError:
+        age = 0
+    return max(0, lifetime - age)
+
+
+class CacheEntry(object):
+    '''The already ingested parts of a response, along with the
+    validators needed to make a conditional request for it.
+
+    When the server answers a conditional request with 304 Not
+    Modified, a navigator can be restored from this entry without
+    parsing the body again. While the entry is fresh, no request needs
+    to be made at all.
+    '''
+
+    def __init__(self,
+                 response=None,
+                 etag=None,
+                 last_modified=None,
+                 expires=0,
+                 state=None,
+                 links=None,
+                 embedded=None,
+                 curies=None,
+                 self_link=None,
+                 content_type=None,
+                 ):
+        self.response = response
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+        self.state = state
+        self.links = links
+        self.embedded = embedded
+        self.curies = curies
+        self.self_link = self_link
+        self.content_type = content_type
+
+    @classmethod
+    def from_response(cls, response, default_ttl=None):
+        '''Creates an entry for a response that hasn't been ingested by
+        a navigator yet. Returns None if the response may not be stored,
+        or if it has neither validators nor a freshness lifetime, since
+        the entry would never be used.
+        '''
+        lifetime = freshness_lifetime(response.headers, default_ttl)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if lifetime is None or \
+           (not lifetime and etag is None and last_modified is None):
+            return None
+        return cls(
+            response=response,
+            etag=etag,
+            last_modified=last_modified,
+            expires=time.time() + lifetime,
+            content_type=response.headers.get('Content-Type'),
+        )
+
+    @classmethod
+    def from_navigator(cls, nav, response, self_link=None, default_ttl=None):
+        '''Creates an entry from a navigator that has just ingested
+        `response`. Returns None under the same conditions as
+        `from_response`.
+        '''
+        entry = cls.from_response(response, default_ttl)
+        if entry is not None:
+            entry.fill(nav, self_link)
+        return entry
+
+    @property
+    def ingested(self):
+        '''Whether the response was ingested by a navigator. Entries
+        loaded from disk are ingested by the first navigator using them'''
+        return self.links is not None
+
+    def fill(self, nav, self_link):
+        '''Keeps the parts of the response `nav` has ingested'''
+        self.state = nav.state
+        self.links = nav._links
+        self.embedded = nav._embedded
+        self.curies = nav.curies
+        self.self_link = self_link
+
+    def drop_body(self):
+        '''Replaces the response by a copy without its body, which isn't
+        needed once it has been ingested. Navigators restored from the
+        entry get the status and headers only'''
+        response = self.response
+        if response is None or not response._content:
+            return
+        stripped = requests.Response()
+        stripped.status_code = response.status_code
+        stripped.reason = response.reason
+        stripped.headers = response.headers
+        stripped.encoding = response.encoding
+        stripped.url = response.url
+        stripped.request = response.request
+        stripped.elapsed = response.elapsed
+        stripped._content = b''
+        stripped._content_consumed = True
+        self.response = stripped
+
+    def holds(self, response):
+        '''Whether `response` is the one this entry was created from.
+        A copy without the body shares the headers of the original'''
+        return response is not None and self.response is not None and (
+            response is self.response
+            or response.headers is self.response.headers)
+
+    def conditional_headers(self):
+        '''Returns the headers that make a GET request conditional on
+        the resource having changed since this entry was stored'''
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def is_fresh(self, now=None):
+        '''Whether the entry can be used without contacting the server'''
+        return (time.time() if now is None else now) < self.expires
+
+    def revalidate(self, headers, default_ttl=None):
+        '''Updates the validators and freshness of this entry from a 304
+        response, which may carry new ones for the unchanged
+        representation'''
+        self.etag = headers.get('ETag', self.etag)
+        self.last_modified = headers.get('Last-Modified', self.last_modified)
+        if 'Cache-Control' not in headers and 'Expires' not in headers:
+            headers = self.response.headers
+        lifetime = freshness_lifetime(headers, default_ttl)
+        self.expires = time.time() + (lifetime or 0)
+
+
+class ResponseCache(object):
+    '''A bounded store of CacheEntry objects keyed by uri. When the
+    cache is full, the least recently used entry is evicted. A maxsize
+    of 0 disables caching entirely. The bodies of ingested entries are
+    dropped when they are stored, so the cache holds their parsed state
+    and headers but not the raw responses.
+
+    Navigators record how each GET was served: `hits` were answered
+    from a fresh entry without a request, `revalidations` by a 304
+    response and `misses` by a full response.
+    '''
+
+    DEFAULT_MAXSIZE = 128
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, uri):
+        return uri in self._entries
+
+    def get(self, uri, default=None, headers=None):
+        '''Retrieves the entry for a uri, marking it as recently used.
+        `headers` are the headers a request for it would be sent with.
+        '''
+        with self._lock:
+            try:
+                entry = self._entries.pop(uri)
+            except KeyError:
+                return default
+            self._entries[uri] = entry
+            return entry
+
+    def put(self, uri, entry):
+        '''Stores an entry for a uri, evicting the least recently used
+        entries if the cache is full'''
+        if self.maxsize <= 0:
+            return
+        if entry.ingested:
+            entry.drop_body()
+        with self._lock:
+            self._entries.pop(uri, None)
+            self._entries[uri] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def record(self, outcome):
+        '''Counts a GET served with the given outcome: one of hits,
+        revalidations or misses'''
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self):
+        '''Returns the counters along with the current size'''
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'revalidations': self.revalidations,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+    def discard(self, uri):
+        '''Removes the entry for a uri if there is one'''
+        with self._lock:
+            self._entries.pop(uri, None)
+
+    def forget(self, uri):
+        '''Drops the entry for a uri from memory. Persistent caches keep
+        their stored copy'''
+        self.discard(uri)
+
+    def refreshed(self, uri, entry):
+        '''Called when an entry was revalidated by a 304 response'''
+        pass
+
+    def use_stale(self, uri, entry, session, default_ttl=None):
+        '''Whether a stale entry may be used without waiting for a
+        request. Caches that allow it revalidate the entry themselves'''
+        return False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    '''A ResponseCache that also stores responses in an sqlite
+    database, so new processes can start with the responses of earlier
+    ones.
+
+    Responses are stored raw, keyed by uri and by the values of the
+    request headers named in their Vary header, and are only ingested
+    when a navigator uses them. At most `max_stored` responses are kept
+    on disk, dropping the oldest first. The number stored is checked
+    every tenth of `max_stored` writes, so it may exceed it by that
+    many in between.
+
+    A response loaded from disk is used even if it is stale, once, and
+    revalidated in the background with a conditional request if
+    `revalidate_in_background` is True. Otherwise stale responses are
+    revalidated before they are used, like in memory.
+
+    Responses marked private and responses to requests with an
+    Authorization header are only kept in memory, unless
+    `store_private` is True.
+    '''
+
+    DEFAULT_MAX_STORED = 10000
+
+    def __init__(self, path, maxsize=ResponseCache.DEFAULT_MAXSIZE,
+                 max_stored=DEFAULT_MAX_STORED, revalidate_in_background=True,
+                 store_private=False):
+        if sqlite3 is None:  # pragma: nocover
+            raise ImportError('SQLiteResponseCache requires sqlite3')
+        super(SQLiteResponseCache, self).__init__(maxsize)
+        self.path = path
+        self.max_stored = max_stored
+        self.revalidate_in_background = revalidate_in_background
+        self.store_private = store_private
+        self.loads = 0
+        self.background_revalidations = 0
+        self._stale = set()  # uris loaded from disk and not revalidated
+        self._executor = None
+        self._prune_every = max(1, max_stored // 10)
+        self._writes = 0  # since the last pruning
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' uri TEXT NOT NULL,'
+                ' variant TEXT NOT NULL,'
+                ' vary TEXT NOT NULL,'
+                ' status INTEGER NOT NULL,'
+                ' reason TEXT,'
+                ' headers TEXT NOT NULL,'
+                ' body BLOB NOT NULL,'
+                ' etag TEXT,'
+                ' last_modified TEXT,'
+                ' expires REAL NOT NULL,'
+                ' stored REAL NOT NULL,'
+                ' PRIMARY KEY (uri, variant))')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS responses_stored'
+                ' ON responses (stored)')
+
+    @staticmethod
+    def _vary(headers):
+        '''Returns the lowercased names of the request headers a
+        response varies on, or None if it may not be reused at all'''
+        names = [name.strip().lower()
+                 for name in (headers.get('Vary') or '').split(',')
+                 if name.strip()]
+        if '*' in names:
+            return None
+        return sorted(set(names))
+
+    @staticmethod
+    def _variant(vary, headers):
+        headers = requests.structures.CaseInsensitiveDict(headers or {})
+        return json.dumps([headers.get(name) for name in vary])
+
+    def _entry_variant(self, entry):
+        '''Returns the variant an entry is stored under, or None if it
+        may not be stored'''
+        response = entry.response
+        vary = self._vary(response.headers)
+        if vary is None:
+            return None
+        request = response.request
+        return self._variant(
+            vary, request.headers if request is not None else None)
+
+    def _storable(self, response):
+        if self.store_private:
+            return True
+        if 'private' in parse_cache_control(
+                response.headers.get('Cache-Control')):
+            return False
+        request = response.request
+        return request is None or 'Authorization' not in request.headers
+
+    def get(self, uri, default=None, headers=None):
+        entry = super(SQLiteResponseCache, self).get(uri)
+        if entry is None:
+            entry = self._load(uri, headers)
+        return default if entry is None else entry
+
+    def _load(self, uri, headers):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT variant, vary, status, reason, headers, body, etag,'
+                ' last_modified, expires FROM responses WHERE uri = ?',
+                (uri,)).fetchall()
+        for variant, vary, status, reason, raw_headers, body, etag, \
+                last_modified, expires in rows:
+            if variant != self._variant(json.loads(vary), headers):
+                continue
+            response = requests.Response()
+            response.status_code = status
+            response.reason = reason
+            response.headers = requests.structures.CaseInsensitiveDict(
+                json.loads(raw_headers))
+            response.encoding = requests.utils.get_encoding_from_headers(
+                response.headers)
+            response.url = uri
+            response._content = bytes(body)
+            # The request headers the response varies on, so it is
+            # stored again under the same variant
+            request = requests.PreparedRequest()
+            request.prepare_method('GET')
+            request.url = uri
+            request.headers = requests.structures.CaseInsensitiveDict(
+                (name, value)
+                for name, value in zip(json.loads(vary), json.loads(variant))
+                if value is not None)
+            response.request = request
+            entry = CacheEntry(
+                response=response,
+                etag=etag,
+                last_modified=last_modified,
+                expires=expires,
+                content_type=response.headers.get('Content-Type'),
+            )
+            with self._lock:
+                self.loads += 1
+                self._stale.add(uri)
+            super(SQLiteResponseCache, self).put(uri, entry)
+            return entry
+
+    def put(self, uri, entry):
+        # Stored before the body is dropped from memory
+        self._store(uri, entry)
+        super(SQLiteResponseCache, self).put(uri, entry)
+
+    def _store(self, uri, entry):
+        response = entry.response
+        variant = self._entry_variant(entry)
+        if variant is None or response.content is None:
+            with self._lock, self._db:
+                self._db.execute('DELETE FROM responses WHERE uri = ?', (uri,))
+            return
+        vary = self._vary(response.headers)
+        if not self._storable(response):
+            with self._lock, self._db:
+                self._db.execute(
+                    'DELETE FROM responses WHERE uri = ? AND variant = ?',
+                    (uri, variant))
+            return
+        with self._lock:
+            self._stale.discard(uri)
+            with self._db:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO responses VALUES'
+                    ' (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (uri, variant, json.dumps(vary), response.status_code,
+                     response.reason, json.dumps(dict(response.headers)),
+                     sqlite3.Binary(response.content), entry.etag,
+                     entry.last_modified, entry.expires, time.time()))
+                self._writes += 1
+                if self._writes >= self._prune_every:
+                    self._writes = 0
+                    self._prune()
+
+    def _prune(self):
+        '''Drops the oldest responses past `max_stored`. Must be called
+        with the lock held'''
+        excess = self._db.execute(
+            'SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_stored
+        if excess > 0:
+            self._db.execute(
+                'DELETE FROM responses WHERE rowid IN ('
+                ' SELECT rowid FROM responses ORDER BY stored LIMIT ?)',
+                (excess,))
+
+    def refreshed(self, uri, entry):
+        variant = self._entry_variant(entry)
+        with self._lock:
+            self._stale.discard(uri)
+            if variant is None:
+                return
+            with self._db:
+                self._db.execute(
+                    'UPDATE responses SET etag = ?, last_modified = ?,'
+                    ' expires = ? WHERE uri = ? AND variant = ?',
+                    (entry.etag, entry.last_modified, entry.expires, uri,
+                     variant))
+
+    def discard(self, uri):
+        super(SQLiteResponseCache, self).discard(uri)
+        with self._lock:
+            self._stale.discard(uri)
+            with self._db:
+                self._db.execute('DELETE FROM responses WHERE uri = ?', (uri,))
+
+    def forget(self, uri):
+        super(SQLiteResponseCache, self).discard(uri)
+
+    def clear(self):
+        super(SQLiteResponseCache, self).clear()
+        with self._lock:
+            self._stale.clear()
+            with self._db:
+                self._db.execute('DELETE FROM responses')
+
+    def use_stale(self, uri, entry, session, default_ttl=None):
+        if not self.revalidate_in_background:
+            return False
+        with self._lock:
+            if uri not in self._stale:
+                return False
+            self._stale.discard(uri)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=4)
+        self._executor.submit(
+            self._revalidate, uri, entry, session, default_ttl)
+        return True
+
+    def _revalidate(self, uri, entry, session, default_ttl):
+        '''Makes a conditional request for an entry loaded from disk.
+        Navigators that already used the entry keep its state, later
+        ones get the revalidated response'''
+        try:
+            response = session.get(
+                uri, headers=entry.conditional_headers(),
+                allow_redirects=False)
+        except requests.RequestException:
+            return
+        with self._lock:
+            self.background_revalidations += 1
+        if response.status_code == 304:
+            entry.revalidate(response.headers, default_ttl)
+            self.refreshed(uri, entry)
+        elif response.status_code == 200:
+            fresh = CacheEntry.from_response(response, default_ttl)
+            if fresh is None:
+                self.discard(uri)
+            else:
+                self.put(uri, fresh)
+        else:
+            self.discard(uri)
+
+    def stats(self):
+        stats = super(SQLiteResponseCache, self).stats()
+        with self._lock:
+            stats['loads'] = self.loads
+            stats['background_revalidations'] = \
+                self.background_revalidations
+            stats['stored'] = self._db.execute(
+                'SELECT COUNT(*) FROM responses').fetchone()[0]
+        return stats
+
+    def close(self):
+        '''Waits for background revalidations and closes the database'''
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            self._db.close()
+
+
+class IdentityMap(object):
+    '''Base class of the identity maps keeping the navigators of an
+    api by uri, so a resource is represented by a single navigator.
+
+    Lookups are counted as hits or misses, and entries dropped to make
+    room or because they expired as evictions.
+    '''
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, uri):
+        raise NotImplementedError
+
+    def __setitem__(self, uri, nav):
+        raise NotImplementedError
+
+    def __delitem__(self, uri):
+        raise NotImplementedError
+
+    def _get(self, uri):
+        '''Returns the navigator for a uri or None, without counting'''
+        raise NotImplementedError
+
+    def get(self, uri, default=None):
+        with self._lock:
+            nav = self._get(uri)
+            if nav is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return nav
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        '''Returns the counters along with the current size'''
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self),
+            }
+
+
+class WeakIdentityMap(IdentityMap):
+    '''Keeps navigators only as long as something else references
+    them. Navigators collected by the garbage collector aren't counted
+    as evictions.
+    '''
+
+    def __init__(self):
+        super(WeakIdentityMap, self).__init__()
+        self._navs = WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._navs)
+
+    def __contains__(self, uri):
+        return uri in self._navs
+
+    def __setitem__(self, uri, nav):
+        self._navs[uri] = nav
+
+    def __delitem__(self, uri):
+        del self._navs[uri]
+
+    def _get(self, uri):
+        return self._navs.get(uri)
+
+    def clear(self):
+        self._navs.clear()
+
+
+class LRUIdentityMap(IdentityMap):
+    '''Keeps strong references to at most `maxsize` navigators,
+    evicting the least recently used ones first. If `ttl` is given,
+    navigators are also evicted that many seconds after they were
+    stored, so they are fetched again with a new navigator.
+    '''
+
+    DEFAULT_MAXSIZE = 1024
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=None):
+        super(LRUIdentityMap, self).__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._navs = OrderedDict()  # uri -> (nav, expiry)
+
+    def __len__(self):
+        return len(self._navs)
+
+    def __contains__(self, uri):
+        with self._lock:
+            return self._get(uri, touch=False) is not None
+
+    def __setitem__(self, uri, nav):
+        if self.maxsize <= 0:
+            return
+        expiry = None if self.ttl is None else time.time() + self.ttl
+        with self._lock:
+            self._navs.pop(uri, None)
+            self._navs[uri] = (nav, expiry)
+            while len(self._navs) > self.maxsize:
+                self._navs.popitem(last=False)
+                self.evictions += 1
+
+    def __delitem__(self, uri):
+        with self._lock:
+            del self._navs[uri]
+
+    def _get(self, uri, touch=True):
+        try:
+            nav, expiry = self._navs[uri]
+        except KeyError:
+            return None
+        if expiry is not None and expiry <= time.time():
+            del self._navs[uri]
+            self.evictions += 1
+            return None
+        if touch:
+            self._navs[uri] = self._navs.pop(uri)
+        return nav
+
+    def clear(self):
+        with self._lock:
+            self._navs.clear()
+
+    def stats(self):
+        stats = super(LRUIdentityMap, self).stats()
+        stats['maxsize'] = self.maxsize
+        return stats
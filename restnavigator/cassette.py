@@ -0,0 +1,206 @@
+'''Recording the http interactions of an api to a cassette file, and
+replaying them without a server.
+
+Cassettes are JSON lines files with one request and its response per
+line. Record a session of navigation with:
+
+    session = requests.Session()
+    cassette.record(session, 'traversal.jsonl')
+    nav = Navigator.hal(root, session=session)
+
+and replay it later, e.g. in benchmarks without network access, with
+`cassette.replay(session, 'traversal.jsonl')`.
+'''
+
+from __future__ import unicode_literals
+
+import base64
+import collections
+import datetime
+import io
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from restnavigator import exc
+
+RECORDED = 'recorded'
+
+
+def _encode_body(body):
+    '''Returns the json fields representing a request or response body'''
+    if body is None:
+        return {}
+    if not isinstance(body, bytes):
+        return {'body': body}
+    try:
+        return {'body': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'body_base64': base64.b64encode(body).decode('ascii')}
+
+
+def _decode_body(fields):
+    if 'body_base64' in fields:
+        return base64.b64decode(fields['body_base64'])
+    body = fields.get('body')
+    return body.encode('utf-8') if body is not None else None
+
+
+def _key(method, uri, body):
+    '''Requests are matched by method, uri and body'''
+    if isinstance(body, bytes):
+        try:
+            body = body.decode('utf-8')
+        except UnicodeDecodeError:
+            body = base64.b64encode(body).decode('ascii')
+    return method.upper(), uri, body or None
+
+
+def load(path):
+    '''Returns the interactions recorded in a cassette file'''
+    with io.open(path, encoding='utf-8') as cassette:
+        return [json.loads(line) for line in cassette if line.strip()]
+
+
+class RecordingAdapter(HTTPAdapter):
+    '''An HTTPAdapter that appends every request it sends, along with
+    the response and how long it took, to a cassette file. Keyword
+    arguments are passed on to HTTPAdapter.
+    '''
+
+    def __init__(self, path, **kwargs):
+        super(RecordingAdapter, self).__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = io.open(path, 'a', encoding='utf-8')
+
+    def send(self, request, **kwargs):
+        started = time.time()
+        response = super(RecordingAdapter, self).send(request, **kwargs)
+        content = response.content  # reads streamed responses too
+        elapsed = time.time() - started
+        interaction = {
+            'request': dict(
+                method=request.method,
+                uri=request.url,
+                headers=dict(request.headers),
+                **_encode_body(request.body)
+            ),
+            'response': dict(
+                status=response.status_code,
+                reason=response.reason,
+                headers=dict(response.headers),
+                elapsed=elapsed,
+                **_encode_body(content)
+            ),
+        }
+        line = json.dumps(interaction, sort_keys=True)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+        return response
+
+    def close(self):
+        super(RecordingAdapter, self).close()
+        with self._lock:
+            self._file.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    '''Answers requests with the responses recorded in a cassette,
+    without any network access.
+
+    Requests are matched by method, uri and body. When the same request
+    was recorded several times, the responses are replayed in order,
+    and the last one is repeated once they run out. Requests that were
+    never recorded raise `exc.NotRecordedError`.
+
+    `latency` is the delay before each response is returned: None for
+    none, RECORDED for the time the recorded request took, a number of
+    seconds, or a callable taking the recorded interaction and returning
+    a number of seconds. Delays are multiplied by `scale`.
+    '''
+
+    def __init__(self, interactions, latency=None, scale=1.0):
+        super(ReplayAdapter, self).__init__()
+        self.latency = latency
+        self.scale = scale
+        self._lock = threading.Lock()
+        self._responses = collections.defaultdict(collections.deque)
+        for interaction in interactions:
+            request = interaction['request']
+            key = _key(request['method'], request['uri'],
+                       _decode_body(request))
+            self._responses[key].append(interaction)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        return cls(load(path), **kwargs)
+
+    def _interaction(self, request):
+        key = _key(request.method, request.url, request.body)
+        with self._lock:
+            recorded = self._responses.get(key)
+            if not recorded:
+                raise exc.NotRecordedError(
+                    'No response was recorded for {0} {1}'.format(
+                        request.method, request.url))
+            if len(recorded) > 1:
+                return recorded.popleft()
+            return recorded[0]
+
+    def _delay(self, interaction):
+        if self.latency is None:
+            return 0
+        elif self.latency == RECORDED:
+            delay = interaction['response'].get('elapsed', 0)
+        elif callable(self.latency):
+            delay = self.latency(interaction)
+        else:
+            delay = self.latency
+        return delay * self.scale
+
+    def send(self, request, **kwargs):
+        interaction = self._interaction(request)
+        recorded = interaction['response']
+        delay = self._delay(interaction)
+        if delay > 0:
+            time.sleep(delay)
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.reason = recorded.get('reason')
+        response.headers = requests.structures.CaseInsensitiveDict(
+            recorded.get('headers', {}))
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers)
+        response._content = _decode_body(recorded) or b''
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = datetime.timedelta(seconds=delay)
+        return response
+
+    def close(self):
+        pass
+
+
+def record(session, path, **kwargs):
+    '''Mounts a RecordingAdapter writing to `path` on a session for
+    http and https. Returns the adapter'''
+    adapter = RecordingAdapter(path, **kwargs)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return adapter
+
+
+def replay(session, path, latency=None, scale=1.0):
+    '''Mounts a ReplayAdapter serving the cassette at `path` on a
+    session for http and https. Returns the adapter'''
+    adapter = ReplayAdapter.from_file(path, latency=latency, scale=scale)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return adapter
@@ -0,0 +1,253 @@
+'''Crawling every resource reachable from a navigator'''
+
+from __future__ import unicode_literals
+
+import collections
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import io
+import json
+import os
+
+from six.moves.urllib import parse as urlparse
+
+from restnavigator import exc
+from restnavigator.halnav import Link
+
+CHECKPOINT_VERSION = 1
+DIGEST_SIZE = 8
+
+
+def uri_digest(uri):
+    '''Returns the compact hash of a uri kept in the visited set. With
+    64 bits, collisions are unlikely even for millions of uris'''
+    data = uri.encode('utf-8')
+    if hasattr(hashlib, 'blake2b'):
+        return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+    return hashlib.sha1(data).digest()[:DIGEST_SIZE]  # pragma: nocover
+
+
+def write_checkpoint(path, frontier, visited):
+    '''Writes a checkpoint atomically: a line of json with the frontier
+    as [uri, depth, rel] lists, followed by the concatenated digests of
+    the visited uris'''
+    header = json.dumps({
+        'version': CHECKPOINT_VERSION,
+        'digest_size': DIGEST_SIZE,
+        'frontier': frontier,
+    })
+    tmp_path = path + '.tmp'
+    with io.open(tmp_path, 'wb') as checkpoint:
+        checkpoint.write(header.encode('utf-8') + b'\n')
+        checkpoint.write(b''.join(visited))
+    getattr(os, 'replace', os.rename)(tmp_path, path)
+
+
+def read_checkpoint(path):
+    '''Returns the frontier and visited digests of a checkpoint'''
+    with io.open(path, 'rb') as checkpoint:
+        header = json.loads(checkpoint.readline().decode('utf-8'))
+        if header.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(
+                'Unsupported checkpoint version {0!r}'.format(
+                    header.get('version')))
+        size = header['digest_size']
+        data = checkpoint.read()
+    visited = set(data[i:i + size] for i in range(0, len(data), size))
+    frontier = [tuple(item) for item in header['frontier']]
+    return frontier, visited
+
+
+class Crawler(object):
+    '''Walks the link graph of an api breadth first from a navigator,
+    fetching up to `concurrency` resources at once and at most
+    `per_host` from the same host.
+
+    Only links and embedded documents under one of `rels` are followed,
+    or all of them if `rels` is None. Resources further than `max_depth`
+    links from the start aren't fetched. `follow` can be a function
+    taking a navigator and returning whether to fetch it. Templated
+    links and embedded documents without a self link aren't followed.
+
+    Each uri is visited once. Navigators that are already resolved,
+    like a root navigator that was fetched before or the documents
+    embedded in a fetched resource, are yielded as they are without a
+    request, unless `refresh` is True. Others are fetched, which is
+    answered from the response cache of the api if a response for
+    their uri is still fresh.
+
+    Navigators are yielded as soon as they are fetched, including those
+    whose response was an error if `raise_exc` is False. Requests that
+    fail without a response are skipped then. For many concurrent
+    requests, mount a `requests.adapters.HTTPAdapter` with a
+    `pool_maxsize` of at least `per_host` on the session of the api.
+
+    If `checkpoint` is the path of a file, the frontier and the hashed
+    visited uris are written to it every `checkpoint_every` navigators
+    and when the crawl stops. If the file exists, the crawl resumes from
+    it instead of starting at `root_nav`; resources in flight when it
+    was written are fetched again. Create the api with a `cache_path`
+    for those requests to be conditional on the responses stored before
+    the crash. A finished crawl leaves a checkpoint with an empty
+    frontier, which must be removed to crawl again.
+    '''
+
+    def __init__(self, root_nav, rels=None, max_depth=None, concurrency=8,
+                 per_host=4, raise_exc=False, follow=None, checkpoint=None,
+                 checkpoint_every=1000, refresh=False):
+        self.root_nav = root_nav
+        self.rels = None if rels is None else set(rels)
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.raise_exc = raise_exc
+        self.follow = follow
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.refresh = refresh
+        self.visited = set()  # digests of the uris
+        # host -> deque of (navigator, depth) waiting to be fetched
+        self._queues = collections.OrderedDict()
+        self._in_flight = collections.Counter()
+
+    def _enqueue(self, nav, depth, resumed=False):
+        if not resumed:
+            if nav.uri is None:
+                return
+            digest = uri_digest(nav.uri)
+            if digest in self.visited:
+                return
+            if self.max_depth is not None and depth > self.max_depth:
+                return
+            if self.follow is not None and not self.follow(nav):
+                return
+            self.visited.add(digest)
+        host = urlparse.urlsplit(nav.uri).netloc
+        self._queues.setdefault(host, collections.deque()).append(
+            (nav, depth))
+
+    def _wanted(self, rel):
+        return self.rels is None or rel in self.rels
+
+    def _discover(self, nav, depth):
+        '''Enqueues the navigators linked and embedded in a fetched
+        navigator'''
+        for rel, linked in nav._links.items():
+            if self._wanted(rel):
+                for target in self._navigators(linked):
+                    self._enqueue(target, depth + 1)
+        for rel, embedded in nav._embedded.items():
+            if self._wanted(rel):
+                for target in self._navigators(embedded):
+                    self._enqueue(target, depth + 1)
+
+    @staticmethod
+    def _navigators(value):
+        values = value if isinstance(value, list) else [value]
+        return [nav for nav in values if hasattr(nav, 'fetch')]
+
+    def _fetch(self, nav):
+        if self.refresh or not nav.resolved:
+            nav.fetch(raise_exc=self.raise_exc, copy=False)
+        return nav
+
+    def _start(self):
+        '''Enqueues the root navigator, or the frontier of the
+        checkpoint if there is one'''
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            self._enqueue(self.root_nav, 0)
+            return
+        frontier, self.visited = read_checkpoint(self.checkpoint)
+        core = self.root_nav._core
+        for uri, depth, rel in frontier:
+            nav = core.nav_class(Link(uri, rel=rel), core)
+            self._enqueue(nav, depth, resumed=True)
+
+    def save_checkpoint(self, pending=None):
+        '''Writes the state of the crawl to the checkpoint file.
+        Navigators in `pending` are in flight and are saved as part of
+        the frontier'''
+        frontier = [
+            [nav.uri, depth, nav.self.rel]
+            for nav, depth, _ in (pending or {}).values()
+        ]
+        for queue in self._queues.values():
+            frontier.extend(
+                [nav.uri, depth, nav.self.rel] for nav, depth in queue)
+        write_checkpoint(
+            self.checkpoint, frontier, self.visited)
+
+    def _submit(self, executor, pending):
+        '''Starts fetching queued navigators, taking turns between hosts
+        with spare capacity'''
+        for host in list(self._queues):
+            queue = self._queues[host]
+            while queue and len(pending) < self.concurrency \
+                    and self._in_flight[host] < self.per_host:
+                nav, depth = queue.popleft()
+                self._in_flight[host] += 1
+                future = executor.submit(self._fetch, nav)
+                pending[future] = (nav, depth, host)
+            if not queue:
+                del self._queues[host]
+            if len(pending) >= self.concurrency:
+                break
+
+    def __iter__(self):
+        self._start()
+        pending = {}
+        fetched = 0
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            while self._queues or pending:
+                self._submit(executor, pending)
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    nav, depth, host = pending.pop(future)
+                    self._in_flight[host] -= 1
+                    try:
+                        future.result()
+                    except exc.HALNavigatorError:
+                        # Unexpected content type, the navigator has
+                        # a response but no links to follow
+                        if self.raise_exc:
+                            raise
+                    except Exception:
+                        if self.raise_exc:
+                            raise
+                        continue
+                    else:
+                        # Embedded navigators are resolved without a
+                        # response
+                        if nav.response is None or nav.response:
+                            self._discover(nav, depth)
+                    if self.checkpoint is not None:
+                        fetched += 1
+                        if fetched % self.checkpoint_every == 0:
+                            self.save_checkpoint(pending)
+                    yield nav
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            if self.checkpoint is not None:
+                self.save_checkpoint(pending)
+
+
+def crawl(root_nav, rels=None, max_depth=None, concurrency=8, per_host=4,
+          raise_exc=False, follow=None, checkpoint=None,
+          checkpoint_every=1000, refresh=False):
+    '''Yields the navigators of every resource reachable from
+    `root_nav` as they are fetched. See `Crawler` for the arguments'''
+    return iter(Crawler(
+        root_nav,
+        rels=rels,
+        max_depth=max_depth,
+        concurrency=concurrency,
+        per_host=per_host,
+        raise_exc=raise_exc,
+        follow=follow,
+        checkpoint=checkpoint,
+        checkpoint_every=checkpoint_every,
+        refresh=refresh,
+    ))
@@ -67,3 +67,9 @@ class OffTheRailsException(TypeError):
              self.traversal,
              self.index + 1,
              self.msg)
+
+
+class NotRecordedError(LookupError):
+    '''Raised when replaying a cassette that has no response for a
+    request'''
+    pass
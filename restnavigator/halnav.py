@@ -5,12 +5,14 @@ from __future__ import unicode_literals
 
 __version__ = '1.0'
 
-from weakref import WeakValueDictionary
+import codecs
+import itertools
 try:
     from http import client as http_client
 except ImportError:
     import httplib as http_client
-import json
+import threading
+import time
 
 try:
     from urllib import parse as urlparse
@@ -20,9 +22,12 @@ import webbrowser
 
 import requests
 import six
+from six.moves import queue
 import uritemplate
 
-from restnavigator import exc, utils
+from restnavigator import cache, exc, json_backends, utils
+
+_timer = getattr(time, 'perf_counter', time.time)
 
 
 DEFAULT_HEADERS = {
@@ -43,8 +48,26 @@ class APICore(object):
 
     This should contain all state that is generally maintained from
     one navigator to the next.
+
+    Listeners can be registered for the events of the requests made by
+    navigators with `add_listener`. Each is called with a dictionary
+    describing the request, which is updated as the request proceeds:
+
+    - on_request_start: method, uri, rel of the link the navigator was
+      created from (or None) and started, a timer value
+    - on_response: status, bytes of the body, total seconds so far,
+      throttle (seconds spent waiting for the rate limiter, including
+      Retry-After), retry (seconds spent on attempts that were retried
+      and backing off after them), and for the last attempt, wait
+      (seconds until the headers were received, including connecting
+      and sending) and download (the rest)
+    - on_ingest_done: ingest seconds, and parse and build seconds if
+      the body was decoded and navigators built from it
+    - on_error: exception, for requests that failed or raised
     '''
 
+    EVENTS = ('on_request_start', 'on_response', 'on_ingest_done', 'on_error')
+
     def __init__(self,
                  root,
                  nav_class,
@@ -52,13 +75,31 @@ class APICore(object):
                  default_curie=None,
                  session=None,
                  id_map=None,
+                 response_cache=None,
+                 default_ttl=None,
+                 transport=None,
+                 json_backend=None,
+                 rate_limiter=None,
+                 retry_policy=None,
+                 coalesce=True,
                  ):
         self.root = root
         self.nav_class = nav_class
         self.apiname = utils.namify(root) if apiname is None else apiname
         self.default_curie = default_curie
         self.session = session or requests.Session()
-        self.id_map = id_map if id_map is not None else WeakValueDictionary()
+        self.id_map = id_map if id_map is not None \
+            else cache.WeakIdentityMap()
+        self.response_cache = response_cache if response_cache is not None \
+            else cache.ResponseCache()
+        self.default_ttl = default_ttl
+        self.transport = transport
+        self.json = json_backends.get_backend(json_backend)
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        # Concurrent GETs of the same uri share one request
+        self.flights = utils.SingleFlight() if coalesce else None
+        self.listeners = {}
 
     def cache(self, link, nav):
         '''Stores a navigator in the identity map for the current
@@ -79,6 +120,16 @@ class APICore(object):
         else:
             return self.id_map.get(link, default)
 
+    def cached_navigator(self, link):
+        '''Returns the navigator for a link to reuse instead of creating
+        a new one, or None. Asks `is_cached` first, then looks the
+        navigator up; it may have been evicted in between, in which
+        case None is returned as well.
+        '''
+        if not self.is_cached(link):
+            return None
+        return self.get_cached(link.uri)
+
     def is_cached(self, link):
         '''Returns whether the current navigator is cached. Intended
         to be overwritten and customized by subclasses.
@@ -94,13 +145,125 @@ class APICore(object):
         '''Sets the authentication for future requests to the api'''
         self.session.auth = auth
 
+    def request(self, method, uri, timings=None, **kwargs):
+        '''Makes a request with the session of the api, waiting for the
+        rate limiter and retrying according to the retry policy if there
+        are any. See `restnavigator.ratelimit.RateLimiter` and
+        `restnavigator.retry.RetryPolicy`.
+
+        If `timings` is a dictionary, the seconds spent waiting for the
+        rate limiter and on retried attempts are stored in it as
+        throttle and retry, and the timer value when the last attempt
+        started as attempt_started.
+        '''
+        if self.rate_limiter is None and self.retry_policy is None:
+            if timings is not None:
+                timings.update(
+                    throttle=0.0, retry=0.0, attempt_started=_timer())
+            return self.session.request(method, uri, **kwargs)
+        attempts = self.new_attempts()
+        throttle = retry = 0.0
+        while True:
+            began = _timer()
+            if self.rate_limiter is not None:
+                self.rate_limiter.wait(uri)
+            attempt_started = _timer()
+            throttle += attempt_started - began
+            try:
+                response = self.session.request(method, uri, **kwargs)
+            except Exception as e:
+                delay = self.retry_delay(method, uri, attempts, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = self.retry_delay(method, uri, attempts, response)
+                if delay is None:
+                    if timings is not None:
+                        timings.update(throttle=throttle, retry=retry,
+                                       attempt_started=attempt_started)
+                    return response
+                response.close()
+            if delay > 0:
+                time.sleep(delay)
+            retry += _timer() - attempt_started
+
+    @staticmethod
+    def new_attempts():
+        '''Returns the retry counts of a new request'''
+        return {'started': time.time(), 'retries': 0, 'rate_limited': 0}
+
+    def retry_delay(self, method, uri, attempts, response=None, error=None):
+        '''Returns the number of seconds to wait before making a request
+        again after it got `response` or raised `error`, or None if it
+        shouldn't be made again. Waits imposed by Retry-After are left
+        to the rate limiter'''
+        policy = self.retry_policy
+        if error is not None:
+            if policy is None:
+                return None
+            delay = policy.delay_after_error(
+                method, error, attempts['retries'], attempts['started'])
+            kind = 'retries'
+        else:
+            delay = None
+            if self.rate_limiter is not None and self.rate_limiter.retry_delay(
+                    uri, response, attempts['rate_limited']) is not None:
+                delay = 0.0
+                kind = 'rate_limited'
+            elif policy is not None:
+                delay = policy.delay_after_response(
+                    method, response, attempts['retries'],
+                    attempts['started'])
+                kind = 'retries'
+        if delay is not None:
+            attempts[kind] += 1
+        return delay
+
+    def add_listener(self, event, listener):
+        '''Registers a function to call with the dictionary describing a
+        request on an event. Without listeners, requests aren't timed'''
+        if event not in self.EVENTS:
+            raise ValueError('Unknown event {0!r}'.format(event))
+        self.listeners.setdefault(event, []).append(listener)
+
+    def remove_listener(self, event, listener):
+        listeners = self.listeners.get(event, [])
+        listeners.remove(listener)
+        if not listeners:
+            self.listeners.pop(event, None)
+
+    def emit(self, event, info):
+        for listener in self.listeners.get(event, ()):
+            listener(info)
+
+    def stats(self):
+        '''Returns the counters of the identity map and of the response
+        cache'''
+        id_map_stats = self.id_map.stats() if hasattr(self.id_map, 'stats') \
+            else {'size': len(self.id_map)}
+        stats = {
+            'id_map': id_map_stats,
+            'response_cache': self.response_cache.stats(),
+        }
+        if self.rate_limiter is not None:
+            stats['rate_limiter'] = self.rate_limiter.stats()
+        if self.retry_policy is not None:
+            stats['retry_policy'] = self.retry_policy.stats()
+        if self.flights is not None:
+            stats['coalesced'] = self.flights.coalesced
+        return stats
+
 
 class Link(object):
-    '''Represents a HAL link. Does not store the link relation'''
+    '''Represents a HAL link. `rel` is the link relation it was found
+    under, if any'''
+
+    __slots__ = ('uri', 'props', 'rel')
 
-    def __init__(self, uri, properties=None):
+    def __init__(self, uri, properties=None, rel=None):
         self.uri = uri
         self.props = properties or {}
+        self.rel = rel
 
     def relative_uri(self, root):
         '''Returns the link of the current uri compared against an api root'''
@@ -112,6 +275,8 @@ class PartialNavigator(object):
     navigator when template arguments are given by calling it.
     '''
 
+    __slots__ = ('link', '_core')
+
     def __init__(self, link, core=None):
         self.link = link
         self._core = core
@@ -145,6 +310,7 @@ class PartialNavigator(object):
         return Link(
             uri=self.expand_uri(**kwargs),
             properties=props,
+            rel=self.link.rel,
         )
 
     @property
@@ -155,7 +321,7 @@ class PartialNavigator(object):
         '''Expands the current PartialNavigator into a new
         navigator. Keyword traversal are supplied to the uri template.
         '''
-        return HALNavigator(
+        return self._core.nav_class(
             core=self._core,
             link=self.expand_link(**kwargs),
         )
@@ -173,17 +339,116 @@ class Navigator(object):
             auth=None, 
             headers=None, 
             session=None,
+            cache_size=None,
+            default_ttl=None,
+            json_backend=None,
+            id_map=None,
+            cache_path=None,
+            rate_limiter=None,
+            retry_policy=None,
+            coalesce=True,
             ):
-        '''Create a HALNavigator'''
+        '''Create a HALNavigator
+
+        `cache_size` bounds how many validated responses are kept for
+        conditional requests. 0 disables the cache.
+        `cache_path` is the path of an sqlite database responses are
+        also stored in, so they outlive the process. See
+        `restnavigator.cache.SQLiteResponseCache`.
+        `rate_limiter` throttles the requests of all navigators of the
+        api, see `restnavigator.ratelimit.RateLimiter`.
+        `retry_policy` retries requests that failed for transient
+        reasons, see `restnavigator.retry.RetryPolicy`.
+        `coalesce` makes navigators fetching a uri while a GET for it is
+        already in flight wait for that response instead of making
+        their own request.
+        `default_ttl` is the number of seconds a response without
+        Cache-Control or Expires headers is considered fresh.
+        `json_backend` selects the json library, see
+        `restnavigator.json_backends.get_backend`.
+        `id_map` keeps the navigators of the api by uri. By default
+        they are only kept while referenced elsewhere; pass a
+        `restnavigator.cache.LRUIdentityMap` to keep a bounded number
+        of them alive.
+        '''
+        return Navigator._create(
+            HALNavigator,
+            root,
+            apiname=apiname,
+            default_curie=default_curie,
+            auth=auth,
+            headers=headers,
+            session=session,
+            cache_size=cache_size,
+            default_ttl=default_ttl,
+            json_backend=json_backend,
+            id_map=id_map,
+            cache_path=cache_path,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            coalesce=coalesce,
+        )
+
+    @staticmethod
+    def hal_async(root,
+                  apiname=None,
+                  default_curie=None,
+                  auth=None,
+                  headers=None,
+                  session=None,
+                  cache_size=None,
+                  default_ttl=None,
+                  transport=None,
+                  json_backend=None,
+                  id_map=None,
+                  cache_path=None,
+                  rate_limiter=None,
+                  retry_policy=None,
+                  ):
+        '''Create an AsyncHALNavigator, whose requests are coroutines.
+
+        `transport` is the `restnavigator.aio.AsyncTransport` used to
+        perform requests. By default, requests are made with the
+        session in a pool of threads. Requires python 3.6 or later.
+        '''
+        from restnavigator import aio
+        return Navigator._create(
+            aio.AsyncHALNavigator,
+            root,
+            apiname=apiname,
+            default_curie=default_curie,
+            auth=auth,
+            headers=headers,
+            session=session,
+            cache_size=cache_size,
+            default_ttl=default_ttl,
+            transport=transport or aio.ThreadedTransport(),
+            json_backend=json_backend,
+            id_map=id_map,
+            cache_path=cache_path,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+        )
+
+    @staticmethod
+    def _create(nav_class, root, auth=None, headers=None, cache_size=None,
+                cache_path=None, **core_kwargs):
+        '''Creates a navigator of the given class for the api root'''
         root = utils.fix_scheme(root)
-        halnav = HALNavigator(
+        if cache_size is None:
+            cache_size = cache.ResponseCache.DEFAULT_MAXSIZE
+        if cache_path is not None:
+            response_cache = cache.SQLiteResponseCache(
+                cache_path, maxsize=cache_size)
+        else:
+            response_cache = cache.ResponseCache(maxsize=cache_size)
+        halnav = nav_class(
             link=Link(uri=root),
             core=APICore(
                 root=root,
-                nav_class=HALNavigator,
-                apiname=apiname,
-                default_curie=default_curie,
-                session=session,
+                nav_class=nav_class,
+                response_cache=response_cache,
+                **core_kwargs
             )
         )
         if auth:
@@ -195,17 +460,34 @@ class Navigator(object):
 
 
 class HALNavigatorBase(object):
-    '''Base class for navigation objects'''
+    '''Base class for navigation objects.
+
+    Navigators are kept compact with __slots__, since long lived
+    processes may hold very many of them. Subclasses should declare
+    __slots__ as well, or their instances will get a __dict__.
+    '''
+
+    __slots__ = (
+        'self',
+        'response',
+        'state',
+        'fetched',
+        'curies',
+        '_core',
+        '_links',
+        '_embedded',
+        '__weakref__',  # for the identity map
+    )
 
     DEFAULT_CONTENT_TYPE = 'application/hal+json'
 
     def __new__(cls, link, core, *args, **kwargs):
         '''New decides whether we need a new instance or whether it's
         already in the id_map of the core'''
-        if core.is_cached(link):
-            return core.get_cached(link.uri)
-        else:
-            return super(HALNavigatorBase, cls).__new__(cls)
+        nav = core.cached_navigator(link)
+        if nav is not None:
+            return nav
+        return super(HALNavigatorBase, cls).__new__(cls)
 
     def __init__(self, link, core,
                  response=None,
@@ -217,7 +499,7 @@ class HALNavigatorBase(object):
         '''Internal constructor. If you want to create a new
         HALNavigator, use the factory `Navigator.hal`
         '''
-        if core.is_cached(link):
+        if hasattr(self, '_core'):
             # Don't want to overwrite a cached navigator
             return
         else:
@@ -309,13 +591,115 @@ class HALNavigatorBase(object):
 
     def __iter__(self):
         '''Part of iteration protocol'''
-        yield self
-        last = self
-        while True:
-            current = last.next()
-            current() # fetch if necessary
+        return self.iter_pages()
+
+    def iter_pages(self, prefetch=0, release=False):
+        '''Iterates over this navigator and the navigators following
+        its next links, fetching each of them.
+
+        If `prefetch` is given, up to that many of the following pages
+        are fetched in a background thread while the current one is
+        being processed.
+
+        If `release` is True, each page is released (see `release`)
+        as soon as the following one is yielded, so memory use doesn't
+        grow with the number of pages iterated over. This includes the
+        navigator iteration started from.
+        '''
+        if prefetch > 0:
+            pages = self._prefetch_pages(prefetch)
+        else:
+            pages = self._walk_pages()
+        if release:
+            return self._release_behind(pages)
+        else:
+            return pages
+
+    @staticmethod
+    def _release_behind(pages):
+        previous = None
+        for page in pages:
+            if previous is not None:
+                previous.release()
+            yield page
+            previous = page
+
+    def _walk_pages(self):
+        self(copy=False)  # fetch if necessary
+        current = self
+        while current is not None:
             yield current
-            last = current
+            current = current._next_page()
+
+    def _next_page(self):
+        '''Returns the fetched navigator at the next link of this one,
+        or None if there isn't one'''
+        try:
+            current = self.next()
+        except StopIteration:
+            return None
+        current(copy=False)  # fetch if necessary
+        return current
+
+    def _prefetch_pages(self, prefetch):
+        pages = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            '''Waits for room in the queue, unless iteration stopped'''
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for page in self._walk_pages():
+                    if not put((page, None)):
+                        return
+            except Exception as e:
+                put((None, e))
+            else:
+                put((None, None))
+
+        producer = threading.Thread(target=produce)
+        producer.daemon = True
+        producer.start()
+        try:
+            while True:
+                page, error = pages.get()
+                if error is not None:
+                    raise error
+                elif page is None:
+                    return
+                yield page
+        finally:
+            stop.set()
+
+    def _get_state(self, copy=True):
+        '''Returns a copy of the state, or a read-only view of it'''
+        if copy:
+            return self.state.copy()
+        else:
+            return utils.MappingProxyType(self.state)
+
+    def release(self):
+        '''Drops the response, state, links and embedded documents of
+        this navigator, along with its cached response, so they can be
+        garbage collected. The navigator will be fetched again if it is
+        needed.
+        '''
+        self.response = None
+        self.state = None
+        self.fetched = False
+        self.curies = None
+        self._links = utils.CurieDict(self._core.default_curie, {})
+        self._embedded = utils.CurieDict(self._core.default_curie, {})
+        if self.uri is not None:
+            self._core.response_cache.forget(self.uri)
 
     def __nonzero__(self):
         '''Whether this navigator was successful.'''
@@ -350,7 +734,8 @@ class HALNavigatorBase(object):
         for i, arg in enumerate(traversal):
             try:
                 if isinstance(arg, six.string_types):
-                    val()  # fetch the resource if necessary
+                    if not val.resolved:
+                        val.fetch()
                     if val._embedded and arg in val._embedded:
                         val = val._embedded[arg]
                     else:
@@ -381,40 +766,58 @@ class HALNavigatorBase(object):
         print('opening', doc_url)
         webbrowser.open(doc_url)
 
-    def _make_links_from(self, body):
-        '''Creates linked navigators from a HAL response body'''
-        ld = utils.CurieDict(self._core.default_curie, {})
-        for rel, link in body.get('_links', {}).items():
-            if rel != 'curies':
-                if isinstance(link, list):
-                    ld[rel] = utils.LinkList(
-                        (self._navigator_or_thunk(lnk), lnk) for lnk in link)
-                else:
-                    ld[rel] = self._navigator_or_thunk(link)
-        return ld
-
-    def _make_embedded_from(self, doc):
-        '''Creates embedded navigators from a HAL response doc'''
-        ld = utils.CurieDict(self._core.default_curie, {})
-        for rel, doc in doc.get('_embedded', {}).items():
-            if isinstance(doc, list):
-                ld[rel] = [self._recursively_embed(d) for d in doc]
-            else:
-                ld[rel] = self._recursively_embed(doc)
-        return ld
+    def _make_links_from(self, links):
+        '''Creates linked navigators from the _links of a HAL
+        document. The navigators for a rel are only created when it is
+        first accessed'''
+        return utils.LazyCurieDict(
+            self._core.default_curie,
+            dict((rel, link) for rel, link in links.items()
+                 if rel != 'curies'),
+            self._link_rel,
+        )
+
+    def _link_rel(self, rel, link):
+        '''Crafts the navigator, or LinkList of navigators, linked
+        under a rel'''
+        if isinstance(link, list):
+            return utils.LinkList(
+                (self._navigator_or_thunk(lnk, rel), lnk) for lnk in link)
+        else:
+            return self._navigator_or_thunk(link, rel)
+
+    def _make_embedded_from(self, embedded):
+        '''Creates embedded navigators from the _embedded documents of
+        a HAL document. The navigators are only created when they are
+        first accessed'''
+        return utils.LazyCurieDict(
+            self._core.default_curie,
+            embedded,
+            self._embed_rel,
+        )
+
+    def _embed_rel(self, rel, doc):
+        '''Crafts the navigator, or list of navigators, embedded under
+        a rel'''
+        if isinstance(doc, list):
+            return utils.LazyList(
+                doc, lambda item: self._recursively_embed(item, rel=rel))
+        else:
+            return self._recursively_embed(doc, rel=rel)
 
-    def _recursively_embed(self, doc, update_state=True):
+    def _recursively_embed(self, doc, update_state=True, rel=None):
         '''Crafts a navigator from a hal-json embedded document'''
+        state, links, embedded = utils.split_hal(doc)
         self_link = None
-        self_uri = utils.getpath(doc, '_links.self.href')
+        self_uri = utils.getpath(links, 'self.href')
         if self_uri is not None:
             uri = urlparse.urljoin(self.uri, self_uri)
             self_link = Link(
                 uri=uri,
-                properties=utils.getpath(doc, '_links.self')
+                properties=links['self'],
+                rel=rel,
             )
-        curies = utils.getpath(doc, '_links.curies')
-        state = utils.getstate(doc)
+        curies = links.get('curies')
         if self_link is None:
             nav = OrphanHALNavigator(
                 link=None,
@@ -425,7 +828,7 @@ class HALNavigatorBase(object):
                 state=state,
             )
         else:
-            nav = HALNavigator(
+            nav = self._core.nav_class(
                 link=self_link,
                 response=None,
                 core=self._core,
@@ -435,16 +838,12 @@ class HALNavigatorBase(object):
         if update_state:
             nav.state = state
 
-        links = self._make_links_from(doc)
-        if links is not None:
-            nav._links = links
-        embedded = self._make_embedded_from(doc)
-        if embedded is not None:
-            nav._embedded = embedded
+        nav._links = self._make_links_from(links)
+        nav._embedded = self._make_embedded_from(embedded)
         return nav
 
 
-    def _navigator_or_thunk(self, link):
+    def _navigator_or_thunk(self, link, rel=None):
         '''Crafts a navigator or from a hal-json link dict.
 
         If the link is relative, the returned navigator will have a
@@ -455,12 +854,12 @@ class HALNavigatorBase(object):
         '''
         # resolve relative uris against the current uri
         uri = urlparse.urljoin(self.uri, link['href'])
-        link_obj = Link(uri=uri, properties=link)
+        link_obj = Link(uri=uri, properties=link, rel=rel)
         if link.get('templated'):
             # Can expand into a real HALNavigator
             return PartialNavigator(link_obj, core=self._core)
         else:
-            return HALNavigator(link_obj, core=self._core)
+            return self._core.nav_class(link_obj, core=self._core)
 
     def _can_parse(self, content_type):
         '''Whether this navigator can parse the given content-type.
@@ -480,16 +879,27 @@ class HALNavigatorBase(object):
                 return True
         return False
 
-    def _parse_content(self, text):
+    def _parse_content(self, content):
         '''Parses the content of a response doc into the correct
         format for .state.
         '''
         try:
-            return json.loads(text)
+            return self._core.json.loads(content)
         except ValueError:
             raise exc.UnexpectedlyNotJSON(
                 "The resource at {.uri} wasn't valid JSON", self)
 
+    def _response_content(self, response):
+        '''Returns the body of a response to be decoded. JSON is utf-8
+        encoded unless a charset says otherwise, so the raw bytes are
+        decoded directly if the json backend can. This skips guessing
+        the encoding and making a decoded copy of the body.'''
+        charset = utils.media_type_charset(response.headers.get('Content-Type'))
+        if charset is None or charset in self._core.json.charsets:
+            return response.content
+        else:
+            return response.text
+
     def _update_self_link(self, link, headers):
         '''Update the self link of this navigator'''
         self.self.props.update(link)
@@ -498,15 +908,20 @@ class HALNavigatorBase(object):
             'Content-Type', self.DEFAULT_CONTENT_TYPE)
         self.self.props
 
-    def _ingest_response(self, response):
+    def _ingest_response(self, response, info=None):
         '''Takes a response object and ingests state, links, embedded
         documents and updates the self link of this navigator to
         correspond. This will only work if the response is valid
-        JSON
+        JSON. Timings are added to `info` if given.
         '''
         self.response = response
         if self._can_parse(response.headers['Content-Type']):
-            hal_json = self._parse_content(response.text)
+            if info is not None:
+                started = _timer()
+            hal_json = self._parse_content(self._response_content(response))
+            if info is not None:
+                parsed = _timer()
+                info['parse'] = parsed - started
         else:
             raise exc.HALNavigatorError(
                 message="Unexpected content type! Wanted {0}, got {1}"
@@ -516,32 +931,51 @@ class HALNavigatorBase(object):
                 status=self.response.status_code,
                 response=self.response,
             )
-        self._links = self._make_links_from(hal_json)
-        self._embedded = self._make_embedded_from(hal_json)
+        # Split off HAL attributes. The decoded document isn't used
+        # anywhere else, so it becomes the state without being copied
+        state, links, embedded = utils.split_hal(hal_json)
+        self._links = self._make_links_from(links)
+        self._embedded = self._make_embedded_from(embedded)
         # Set properties from new document's self link
-        self._update_self_link(
-            hal_json.get('_links', {}).get('self', {}),
-            response.headers,
-        )
+        self_link = links.get('self', {})
+        self._update_self_link(self_link, response.headers)
         # Set curies if available
         self.curies = dict(
             (curie['name'], curie['href'])
-            for curie in
-            hal_json.get('_links', {}).get('curies', []))
-        # Set state by removing HAL attributes
-        self.state = utils.getstate(hal_json)
-
-
-class HALNavigator(HALNavigatorBase):
-    '''The main navigation entity'''
-
-    def __call__(self, raise_exc=True):
-        if not self.resolved:
-            return self.fetch(raise_exc=raise_exc)
+            for curie in links.get('curies', []))
+        self.state = state
+        if info is not None:
+            info['build'] = _timer() - parsed
+        return self_link
+
+    def _ingest_cached(self, entry, response=None):
+        '''Restores the state, links and embedded documents of this
+        navigator from a cache entry. If the entry was revalidated with
+        the server, `response` is the 304 response it answered with.
+        '''
+        if entry.ingested:
+            self._links = entry.links
+            self._embedded = entry.embedded
+            headers = {}
+            if entry.content_type is not None:
+                headers['Content-Type'] = entry.content_type
+            self._update_self_link(entry.self_link, headers)
+            self.curies = entry.curies
+            self.state = entry.state
+            if not entry.holds(self.response):
+                # Keep the full response if this navigator received it
+                self.response = entry.response
         else:
-            return self.state.copy()
+            # Loaded from a persistent cache, this navigator keeps the
+            # body it ingested
+            entry.fill(self, self._ingest_response(entry.response))
+            entry.drop_body()
+        if response is not None:
+            self.response = response
+            entry.revalidate(response.headers, self._core.default_ttl)
+            self._core.response_cache.refreshed(self.uri, entry)
 
-    def _create_navigator(self, response, raise_exc=True):
+    def _create_navigator(self, response, raise_exc=True, info=None):
         '''Create the appropriate navigator from an api response'''
         method = response.request.method
         # TODO: refactor once hooks in place
@@ -553,7 +987,7 @@ class HALNavigator(HALNavigatorBase):
                 http_client.NO_CONTENT) \
            and 'Location' in response.headers:
             uri = urlparse.urljoin(self._core.root, response.headers['Location'])
-            nav = HALNavigator(
+            nav = self._core.nav_class(
                 link=Link(uri=uri),
                 core=self._core
             )
@@ -566,46 +1000,276 @@ class HALNavigator(HALNavigatorBase):
                 response=response,
                 parent=self,
             )
-            nav._ingest_response(response)
+            nav._ingest_response(response, info)
         elif method == GET:
             nav = self
-            nav._ingest_response(response)
+            self_link = nav._ingest_response(response, info)
+            if response.status_code == http_client.OK:
+                entry = cache.CacheEntry.from_navigator(
+                    nav, response, self_link, self._core.default_ttl)
+                if entry is not None:
+                    self._core.response_cache.put(self.uri, entry)
+                else:
+                    self._core.response_cache.discard(self.uri)
         else: # pragma: nocover
             assert False, "This shouldn't happen"
 
         return nav
 
-    def _request(self, method, body=None, raise_exc=True, headers=None, files=None):
-        '''Fetches HTTP response using the passed http method. Raises
-        HALNavigatorError if response is in the 400-500 range.'''
+    def _prepare_request(self, method, body=None, headers=None, files=None):
+        '''Returns the keyword arguments for a request with the given
+        http method, along with the cache entry a GET request was made
+        conditional on (if any)'''
         headers = headers or {}
-        if body and 'Content-Type' not in headers:
+        if isinstance(body, dict) and not files:
+            body = self._core.json.dumps(body)
+            headers.setdefault('Content-Type', 'application/json')
+        elif body and 'Content-Type' not in headers:
             headers.update({'Content-Type': 'application/json'})
-        response = self._core.session.request(
-            method,
-            self.uri,
-            data=body if not isinstance(body, dict) else None,
-            json=body if isinstance(body, dict) else None,
+        entry = None
+        if method == GET:
+            entry = self._core.response_cache.get(
+                self.uri, headers=self.headers)
+            if entry is not None:
+                for header, value in entry.conditional_headers().items():
+                    headers.setdefault(header, value)
+        request_kwargs = dict(
+            data=body,
             files=files,
             headers=headers,
             allow_redirects=False,
         )
-        nav = self._create_navigator(response, raise_exc=raise_exc)
-        if raise_exc and not response:
+        return request_kwargs, entry
+
+    def _request_started(self, method):
+        '''Returns the dictionary describing a request to the listeners
+        of the api, or None if there are none, so requests without
+        listeners aren't timed'''
+        if not self._core.listeners:
+            return None
+        info = {
+            'method': method,
+            'uri': self.uri,
+            'rel': self.self.rel if self.self is not None else None,
+            'started': _timer(),
+        }
+        self._core.emit('on_request_start', info)
+        return info
+
+    def _request_failed(self, info, exception):
+        info['exception'] = exception
+        self._core.emit('on_error', info)
+
+    def _handle_response(self, response, entry=None, raise_exc=True,
+                         info=None, timings=None):
+        '''Ingests a response to a request prepared by
+        `_prepare_request` and returns the resulting navigator. Raises
+        HALNavigatorError if response is in the 400-500 range.
+
+        `info` is the dictionary returned by `_request_started`, and
+        `timings` the one filled by `APICore.request`, if any.
+        '''
+        if info is None:
+            return self._process_response(response, entry, raise_exc)
+        now = _timer()
+        total = now - info['started']
+        wait = response.elapsed.total_seconds()
+        timings = timings or {}
+        attempt = now - timings.get('attempt_started', info['started'])
+        info.update(
+            status=response.status_code,
+            bytes=len(response.content or b''),
+            total=total,
+            throttle=timings.get('throttle', 0.0),
+            retry=timings.get('retry', 0.0),
+            wait=wait,
+            download=max(0.0, attempt - wait),
+        )
+        self._core.emit('on_response', info)
+        started = _timer()
+        try:
+            nav = self._process_response(response, entry, raise_exc, info)
+        except Exception as e:
+            self._request_failed(info, e)
+            raise
+        info['ingest'] = _timer() - started
+        self._core.emit('on_ingest_done', info)
+        return nav
+
+    def _process_response(self, response, entry, raise_exc, info=None):
+        '''Creates the navigator for a response, see `_handle_response`'''
+        if entry is not None \
+           and response.status_code == http_client.NOT_MODIFIED:
+            self._core.response_cache.record('revalidations')
+            self._ingest_cached(entry, response)
+            nav = self
+        else:
+            if response.request.method == GET:
+                self._core.response_cache.record('misses')
+            else:
+                self._invalidate_cached(response)
+            nav = self._create_navigator(response, raise_exc, info)
+        if raise_exc:
+            self._raise_for_response(response, nav)
+        return nav
+
+    def _invalidate_cached(self, response):
+        '''Discards the cached responses a write request may have made
+        stale: the one for this uri and those for the uris in its
+        Location and Content-Location headers'''
+        response_cache = self._core.response_cache
+        response_cache.discard(self.uri)
+        for header in ('Location', 'Content-Location'):
+            if header in response.headers:
+                response_cache.discard(urlparse.urljoin(
+                    self.uri, response.headers[header]))
+
+    @staticmethod
+    def _raise_for_response(response, nav):
+        '''Raises HALNavigatorError if response is in the 400-500 range'''
+        if not response:
             raise exc.HALNavigatorError(
                 message=response.text,
                 status=response.status_code,
                 nav=nav,  # may be self
                 response=response,
             )
+
+    def _ingest_from(self, nav):
+        '''Shares the ingested response of another navigator for the
+        same resource'''
+        self._ingest_cached(cache.CacheEntry(
+            response=nav.response,
+            state=nav.state,
+            links=nav._links,
+            embedded=nav._embedded,
+            curies=nav.curies,
+            self_link=nav.self.props,
+            content_type=nav.response.headers.get('Content-Type'),
+        ))
+
+    def _fresh_entry(self, use_cache=True):
+        '''Returns the cache entry for this navigator if it can be used
+        without making a request'''
+        if use_cache:
+            response_cache = self._core.response_cache
+            entry = response_cache.get(self.uri, headers=self.headers)
+            if entry is None:
+                return None
+            if entry.is_fresh() or response_cache.use_stale(
+                    self.uri, entry, self._core.session,
+                    self._core.default_ttl):
+                response_cache.record('hits')
+                return entry
+
+
+class HALNavigator(HALNavigatorBase):
+    '''The main navigation entity'''
+
+    __slots__ = ()
+
+    def __call__(self, raise_exc=True, copy=True):
+        '''Returns the state of this navigator, fetching it first if
+        necessary. See `fetch` for the arguments'''
+        if not self.resolved:
+            return self.fetch(raise_exc=raise_exc, copy=copy)
         else:
-            return nav
+            return self._get_state(copy)
 
-    def fetch(self, raise_exc=True):
-        '''Performs a GET request to the uri of this navigator'''
-        self._request(GET, raise_exc=raise_exc)  # ingests response
+    def _request(self, method, body=None, raise_exc=True, headers=None, files=None):
+        '''Fetches HTTP response using the passed http method. Raises
+        HALNavigatorError if response is in the 400-500 range.'''
+        request_kwargs, entry = self._prepare_request(
+            method, body, headers, files)
+        info = self._request_started(method)
+        timings = None if info is None else {}
+        try:
+            response = self._core.request(
+                method, self.uri, timings=timings, **request_kwargs)
+        except Exception as e:
+            if info is not None:
+                self._request_failed(info, e)
+            raise
+        return self._handle_response(
+            response, entry, raise_exc, info, timings)
+
+    def fetch(self, raise_exc=True, use_cache=True, copy=True):
+        '''Performs a GET request to the uri of this navigator.
+
+        If the resource was fetched before and its response is still
+        fresh, the cached state is returned without a request, unless
+        `use_cache` is False.
+
+        A copy of the state is returned that can be freely modified.
+        If `copy` is False, a read-only view of the state is returned
+        instead, which is cheaper for reading.
+        '''
+        entry = self._fresh_entry(use_cache)
+        if entry is not None:
+            self._ingest_cached(entry)
+        elif self._core.flights is None:
+            self._request(GET, raise_exc=raise_exc)  # ingests response
+        else:
+            self._coalesced_get(raise_exc)
         self.fetched = True
-        return self.state.copy()
+        return self._get_state(copy)
+
+    def _coalesced_get(self, raise_exc=True):
+        '''Makes a GET request, unless one for the same uri is already
+        in flight, in which case its response is shared instead'''
+        def get():
+            self._request(GET, raise_exc=False)
+            return self
+        leader, made = self._core.flights.do(self.uri, get)
+        if not made and leader is not self:
+            self._ingest_from(leader)
+        if raise_exc:
+            self._raise_for_response(self.response, self)
+
+    def stream_embedded(self, rel, chunk_size=65536, raise_exc=True):
+        '''Yields navigators for the documents embedded under `rel` in
+        this resource while the response is still being downloaded and
+        parsed. Only one embedded document is decoded at a time, so huge
+        collections can be processed in bounded memory.
+
+        The state, links and embedded documents of this navigator
+        itself are not updated. `rel` may omit the default curie.
+        '''
+        response = self._core.request(
+            GET, self.uri, stream=True, allow_redirects=False)
+        try:
+            if raise_exc and not response:
+                raise exc.HALNavigatorError(
+                    message=response.text,
+                    status=response.status_code,
+                    nav=self,
+                    response=response,
+                )
+            content_type = response.headers.get('Content-Type')
+            if not self._can_parse(content_type):
+                raise exc.HALNavigatorError(
+                    message="Unexpected content type! Wanted {0}, got {1}"
+                    .format(self.headers.get('Accept',
+                                             self.DEFAULT_CONTENT_TYPE),
+                            content_type),
+                    nav=self,
+                    status=response.status_code,
+                    response=response,
+                )
+            decoder = codecs.getincrementaldecoder(
+                utils.media_type_charset(content_type) or 'utf-8')()
+            chunks = itertools.chain(
+                (decoder.decode(chunk)
+                 for chunk in response.iter_content(chunk_size)),
+                [decoder.decode(b'', True)],
+            )
+            rels = [rel]
+            if ':' not in rel and self._core.default_curie is not None:
+                rels.append('{0}:{1}'.format(self._core.default_curie, rel))
+            for doc in utils.iter_json_array(chunks, ['_embedded', rels]):
+                yield self._recursively_embed(doc, rel=rel)
+        finally:
+            response.close()
 
     def create(self, body=None, raise_exc=True, headers=None, **kwargs):
         '''Performs an HTTP POST to the server, to create a
@@ -655,6 +1319,9 @@ class OrphanHALNavigator(HALNavigatorBase):
     was created from. If the result is a HAL document, it will be
     populated properly
     '''
+
+    __slots__ = ('parent',)
+
     def __init__(self, link, core,
                  response=None,
                  state=None,
@@ -667,7 +1334,7 @@ class OrphanHALNavigator(HALNavigatorBase):
         self.parent = parent
 
     def __call__(self, *args, **kwargs):
-        return self.state.copy()
+        return self._get_state(kwargs.get('copy', True))
 
     def __repr__(self):  # pragma: nocover
         relative_uri = self.parent.self.relative_uri(self._core.root)
@@ -679,10 +1346,10 @@ class OrphanHALNavigator(HALNavigatorBase):
         '''If something doesn't parse, we just return an empty doc'''
         return True
 
-    def _parse_content(self, text):
+    def _parse_content(self, content):
         '''Try to parse as HAL, but on failure use an empty dict'''
         try:
-            return super(OrphanHALNavigator, self)._parse_content(text)
+            return super(OrphanHALNavigator, self)._parse_content(content)
         except exc.UnexpectedlyNotJSON:
             return {}
 
@@ -690,6 +1357,6 @@ class OrphanHALNavigator(HALNavigatorBase):
         '''OrphanHALNavigator has no link object'''
         pass
 
-    def _navigator_or_thunk(self, link):
+    def _navigator_or_thunk(self, link, rel=None):
         '''We need to resolve relative links against the parent uri'''
-        return HALNavigatorBase._navigator_or_thunk(self.parent, link)
+        return HALNavigatorBase._navigator_or_thunk(self.parent, link, rel)
@@ -0,0 +1,109 @@
+'''Interchangeable json libraries used to decode responses and encode
+request bodies.
+
+The stdlib json module is used by default. Faster libraries can be
+selected by name if they're installed, or with 'auto' for the fastest
+one available.
+'''
+
+from __future__ import unicode_literals
+
+import json
+import sys
+try:
+    from collections import OrderedDict
+except ImportError:  # pragma: nocover
+    from ordereddict import OrderedDict
+
+UTF8_CHARSETS = frozenset(['utf-8', 'utf8', 'us-ascii', 'ascii'])
+# The stdlib json module detects utf-16 and utf-32 in bytes as well
+UNICODE_CHARSETS = UTF8_CHARSETS | frozenset(['utf-16', 'utf-32'])
+
+
+class JSONBackend(object):
+    '''A json decoder and encoder pair.
+
+    `loads` must accept str or bytes and raise a ValueError for invalid
+    json. `dumps` may return str or bytes; bodies are always sent as
+    utf-8 encoded bytes.
+
+    `charsets` are the encodings `loads` decodes from bytes by itself.
+    Responses in other charsets are decoded to str before being passed
+    to it.
+    '''
+
+    def __init__(self, name, loads, dumps, charsets=UTF8_CHARSETS):
+        self.name = name
+        self._loads = loads
+        self._dumps = dumps
+        self.charsets = frozenset(charsets)
+
+    def __repr__(self):  # pragma: nocover
+        return '{0}({1!r})'.format(type(self).__name__, self.name)
+
+    def loads(self, content):
+        return self._loads(content)
+
+    def dumps(self, obj):
+        encoded = self._dumps(obj)
+        if not isinstance(encoded, bytes):
+            encoded = encoded.encode('utf-8')
+        return encoded
+
+
+def _stdlib():
+    if sys.version_info[0] == 3 and sys.version_info < (3, 6):
+        # json.loads only accepts bytes from python 3.6
+        def loads(content):
+            if isinstance(content, bytes):
+                content = content.decode('utf-8')
+            return json.loads(content)
+        return JSONBackend('json', loads, json.dumps)
+    return JSONBackend('json', json.loads, json.dumps, UNICODE_CHARSETS)
+
+
+def _orjson():
+    import orjson
+    return JSONBackend('orjson', orjson.loads, orjson.dumps)
+
+
+def _ujson():
+    import ujson
+    return JSONBackend('ujson', ujson.loads, ujson.dumps)
+
+
+def _simdjson():
+    import simdjson
+    # simdjson only decodes
+    return JSONBackend('simdjson', simdjson.loads, json.dumps)
+
+
+# In order of preference for 'auto'
+BACKENDS = OrderedDict([
+    ('orjson', _orjson),
+    ('ujson', _ujson),
+    ('simdjson', _simdjson),
+    ('json', _stdlib),
+])
+
+
+def get_backend(backend=None):
+    '''Returns a JSONBackend. `backend` may be a JSONBackend, the name
+    of one in BACKENDS, 'auto' for the fastest one installed, or None
+    for the stdlib json module.
+
+    Raises ImportError if the named library isn't installed.
+    '''
+    if isinstance(backend, JSONBackend):
+        return backend
+    elif backend is None:
+        return _stdlib()
+    elif backend == 'auto':
+        for factory in BACKENDS.values():
+            try:
+                return factory()
+            except ImportError:
+                pass
+    elif backend in BACKENDS:
+        return BACKENDS[backend]()
+    raise ValueError('Unknown json backend: {0!r}'.format(backend))
@@ -0,0 +1,128 @@
+'''Throttling the requests made to an api'''
+
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from six.moves.urllib import parse as urlparse
+
+from restnavigator import cache
+
+RETRY_AFTER_STATUSES = (429, 503)
+
+
+def retry_after(response):
+    '''Returns the number of seconds a 429 or 503 response asks to wait
+    in its Retry-After header, or None'''
+    if response.status_code not in RETRY_AFTER_STATUSES:
+        return None
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        date = cache.parse_http_date(value)
+        if date is None:
+            return None
+        return max(0.0, date - time.time())
+
+
+class TokenBucket(object):
+    '''Allows `rate` requests per second on average, and bursts of up to
+    `burst` requests'''
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.updated = time.time()
+
+    def reserve(self, now):
+        '''Takes a token and returns the number of seconds to wait
+        before using it. Tokens can be reserved ahead, so concurrent
+        callers are spaced out rather than all waiting for the same one'''
+        if now > self.updated:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RateLimiter(object):
+    '''Throttles the requests of all navigators sharing an APICore to
+    `rate` requests per second per host, with bursts of up to `burst`
+    requests. A `rate` of None only honours Retry-After.
+
+    When a 429 or 503 response has a Retry-After header, requests to
+    its host wait that long, and the request is made again up to
+    `max_retries` times, unless the wait would exceed `max_wait`
+    seconds, in which case the response is returned.
+    '''
+
+    def __init__(self, rate=None, burst=1, max_retries=3, max_wait=60.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self._buckets = {}
+        self._blocked_until = {}
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.waited = 0.0
+        self.retried_after = 0
+
+    @staticmethod
+    def host(uri):
+        return urlparse.urlsplit(uri).netloc
+
+    def reserve(self, uri):
+        '''Reserves a request to `uri` and returns the number of seconds
+        to wait before making it'''
+        host = self.host(uri)
+        now = time.time()
+        with self._lock:
+            delay = max(0.0, self._blocked_until.get(host, 0) - now)
+            if self.rate is not None:
+                bucket = self._buckets.get(host)
+                if bucket is None:
+                    bucket = self._buckets[host] = TokenBucket(
+                        self.rate, self.burst)
+                delay = max(delay, bucket.reserve(now))
+            if delay > 0:
+                self.throttled += 1
+                self.waited += delay
+        return delay
+
+    def wait(self, uri):
+        '''Blocks until a request to `uri` may be made'''
+        delay = self.reserve(uri)
+        if delay > 0:
+            time.sleep(delay)
+
+    def retry_delay(self, uri, response, attempt):
+        '''Returns the number of seconds to wait before making the
+        request for `response` again, or None if it shouldn't be. Blocks
+        the host for that long'''
+        delay = retry_after(response)
+        if delay is None or attempt >= self.max_retries \
+                or delay > self.max_wait:
+            return None
+        host = self.host(uri)
+        with self._lock:
+            self._blocked_until[host] = max(
+                self._blocked_until.get(host, 0), time.time() + delay)
+            self.retried_after += 1
+        return delay
+
+    def stats(self):
+        with self._lock:
+            return {
+                'throttled': self.throttled,
+                'waited': self.waited,
+                'retried_after': self.retried_after,
+            }
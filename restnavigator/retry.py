@@ -0,0 +1,102 @@
+'''Retrying requests that failed for transient reasons'''
+
+from __future__ import unicode_literals
+
+import random
+import threading
+import time
+
+import requests
+
+from restnavigator import ratelimit
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([502, 503, 504])
+RETRY_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class RetryPolicy(object):
+    '''Decides whether and when a failed request is made again.
+
+    Requests with an idempotent method are retried when they raise a
+    connection error or timeout, or get a response with one of
+    `statuses`. POST and PATCH requests are only retried if listed in
+    `unsafe_methods`, since the server may have acted on them already.
+
+    A request is made at most `max_attempts` times. Before retry n
+    (counting from 0), it waits a random time of up to
+    `backoff * 2 ** n` seconds, capped at `max_backoff`, or longer if
+    the response has a Retry-After header. It isn't retried once the
+    wait would take it past `max_elapsed` seconds since the first
+    attempt.
+    '''
+
+    def __init__(self, max_attempts=4, backoff=0.5, max_backoff=30.0,
+                 max_elapsed=120.0, statuses=RETRY_STATUSES,
+                 unsafe_methods=()):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_elapsed = max_elapsed
+        self.statuses = frozenset(statuses)
+        self.methods = IDEMPOTENT_METHODS | frozenset(
+            method.upper() for method in unsafe_methods)
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.retried_errors = 0
+        self.retried_statuses = 0
+        self.gave_up = 0
+
+    def _backoff(self, retries):
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** retries))
+
+    def _delay(self, method, retries, started, minimum=0.0):
+        if method.upper() not in self.methods:
+            return None
+        delay = max(minimum, self._backoff(retries))
+        if retries + 1 >= self.max_attempts or \
+                time.time() + delay - started > self.max_elapsed:
+            with self._lock:
+                self.gave_up += 1
+            return None
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def delay_after_error(self, method, error, retries, started):
+        '''Returns the number of seconds to wait before retrying a
+        request that raised `error`, or None if it shouldn't be.
+        `retries` is the number of retries made so far, and `started`
+        the time of the first attempt'''
+        if not isinstance(error, RETRY_EXCEPTIONS):
+            return None
+        delay = self._delay(method, retries, started)
+        if delay is not None:
+            with self._lock:
+                self.retried_errors += 1
+        return delay
+
+    def delay_after_response(self, method, response, retries, started):
+        '''Like `delay_after_error`, for a request that got `response`'''
+        if response.status_code not in self.statuses:
+            return None
+        delay = self._delay(method, retries, started,
+                            ratelimit.retry_after(response) or 0.0)
+        if delay is not None:
+            with self._lock:
+                self.retried_statuses += 1
+        return delay
+
+    def stats(self):
+        with self._lock:
+            return {
+                'retries': self.retries,
+                'retried_errors': self.retried_errors,
+                'retried_statuses': self.retried_statuses,
+                'gave_up': self.gave_up,
+            }
@@ -18,8 +18,12 @@ except ImportError:
     decode = codecs.decode
 import re
 import collections
+import json
+from concurrent.futures import ThreadPoolExecutor
 import itertools
 import copy
+import sys
+import threading
 import six
 if hasattr(str, 'maketrans'):
     translate = lambda s, trans: s.translate(str.maketrans('', '', "abcdef:.[]"))
@@ -32,6 +36,31 @@ from restnavigator import exc, registry
 
 unicode_type = type(u'')
 
+try:
+    from types import MappingProxyType
+except ImportError:  # pragma: nocover
+    class MappingProxyType(collections.Mapping):
+        '''Read-only view of a dictionary, for pythons without
+        types.MappingProxyType'''
+
+        def __init__(self, d):
+            self._d = d
+
+        def __getitem__(self, key):
+            return self._d[key]
+
+        def __iter__(self):
+            return iter(self._d)
+
+        def __len__(self):
+            return len(self._d)
+
+        def copy(self):
+            return self._d.copy()
+
+        def __repr__(self):
+            return '{0}({1!r})'.format(type(self).__name__, self._d)
+
 
 def fix_scheme(url):
     '''Prepends the http:// scheme if necessary to a url. Fails if a scheme
@@ -177,6 +206,102 @@ def parse_media_type(media_type):
     return tuple(x.strip() or None for x in (media_type, subtype, parameter))
 
 
+def media_type_charset(media_type):
+    '''Returns the lowercased charset parameter of an http media type,
+    or None if there isn't one'''
+    _, _, parameters = parse_media_type(media_type)
+    for parameter in (parameters or '').split(';'):
+        name, _, value = parameter.partition('=')
+        if name.strip().lower() == 'charset':
+            return value.strip().strip('"').lower() or None
+    return None
+
+
+FetchResult = collections.namedtuple(
+    'FetchResult', ['navigator', 'state', 'exception'])
+
+
+def fetch_all(navigators, max_workers=8, raise_exc=True):
+    '''Fetches navigators concurrently, sharing the connection pool of
+    their api's session. Returns a list of FetchResults in the same
+    order as `navigators`.
+
+    Navigators that are already resolved aren't fetched again, and a
+    navigator appearing several times is fetched once. If a fetch
+    fails, the exception is stored in its FetchResult instead of
+    aborting the others. Raising on http error statuses is controlled
+    by `raise_exc`, as with `HALNavigator.fetch`.
+
+    The session's connection pool should be at least `max_workers`
+    large for connections to be reused.
+    '''
+    navigators = list(navigators)
+
+    def _fetch(nav):
+        if nav.resolved:
+            return nav()
+        return nav.fetch(raise_exc=raise_exc)
+
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for nav in navigators:
+            if id(nav) not in futures:
+                futures[id(nav)] = executor.submit(_fetch, nav)
+    results = []
+    for nav in navigators:
+        future = futures[id(nav)]
+        error = future.exception()
+        state = future.result() if error is None else None
+        results.append(FetchResult(nav, state, error))
+    return results
+
+
+class SingleFlight(object):
+    '''Makes one call per key at a time. Callers arriving while a call
+    for their key is in progress wait for it and share its result or
+    exception instead of making their own.
+    '''
+
+    class _Call(object):
+        __slots__ = ('done', 'result', 'error')
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        '''Returns the result of calling `fn`, or of the call for `key`
+        in progress, along with whether this caller made the call'''
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                six.reraise(*call.error)
+            return call.result, False
+        try:
+            call.result = fn()
+        except BaseException:
+            call.error = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, True
+
+
 class LinkList(list):
     '''A list subclass that offers different ways of grabbing the values based
     on various metadata stored for each entry in the dictionary.
@@ -185,6 +310,8 @@ class LinkList(list):
     has been made to make this convenient. Deleting items will not remove them
     from the list's metadata.'''
 
+    __slots__ = ('_meta',)
+
     def __init__(self, items=None):
         super(LinkList, self).__init__()
         self._meta = {}
@@ -228,11 +355,19 @@ class LinkList(list):
         name = self.serialize(name)
         return self.get_by('name', name)
 
+    def fetch_all(self, max_workers=8, raise_exc=True):
+        '''Fetches all navigators in this list concurrently. Returns a
+        list of FetchResults in the same order as the list. See
+        `fetch_all`'''
+        return fetch_all(self, max_workers=max_workers, raise_exc=raise_exc)
+
 
 class CurieDict(dict):
     '''dict subclass that allows specifying a default curie. This
     enables multiple ways to access an item'''
 
+    __slots__ = ('default_curie',)
+
     def __init__(self, default_curie, d):
         super(CurieDict, self).__init__(d)
         self.default_curie = default_curie
@@ -245,13 +380,217 @@ class CurieDict(dict):
             return super(CurieDict, self).__contains__(implicit_key)
 
     def __getitem__(self, key):
+        return self._lookup(self._resolve_key(key))
+
+    def _resolve_key(self, key):
+        '''Returns the key an item is actually stored under'''
         if (':' in key
             or (super(CurieDict, self).__contains__(key)
                 and key in registry.iana_rels)
             or self.default_curie is None):
-            return super(CurieDict, self).__getitem__(key)
-        implicit_key = '{0}:{1}'.format(self.default_curie, key)
-        return super(CurieDict, self).__getitem__(implicit_key)
+            return key
+        return '{0}:{1}'.format(self.default_curie, key)
+
+    def _lookup(self, key):
+        return super(CurieDict, self).__getitem__(key)
+
+    def fetch_all(self, max_workers=8, raise_exc=True):
+        '''Fetches all navigators in this dictionary concurrently, in a
+        single batch. Returns a CurieDict with the same keys, whose
+        values are FetchResults, or lists of FetchResults where the
+        value was a list of navigators. See `fetch_all`'''
+        rels = list(self.keys())
+        values = [self._lookup(rel) for rel in rels]
+        navigators = []
+        for value in values:
+            navigators.extend(value if isinstance(value, list) else [value])
+        results = iter(fetch_all(
+            navigators, max_workers=max_workers, raise_exc=raise_exc))
+        fetched = CurieDict(self.default_curie, {})
+        for rel, value in zip(rels, values):
+            if isinstance(value, list):
+                fetched[rel] = [next(results) for _ in value]
+            else:
+                fetched[rel] = next(results)
+        return fetched
+
+
+class LazyCurieDict(CurieDict):
+    '''CurieDict whose values are created from raw values the first
+    time they are accessed. `factory` is called with the key and the
+    raw value, and its result replaces the raw value.
+    '''
+
+    __slots__ = ('_factory', '_pending')
+
+    def __init__(self, default_curie, d, factory):
+        super(LazyCurieDict, self).__init__(default_curie, d)
+        self._factory = factory
+        self._pending = set(self.keys())
+
+    def _lookup(self, key):
+        value = super(LazyCurieDict, self)._lookup(key)
+        if key in self._pending:
+            value = self._factory(key, value)
+            dict.__setitem__(self, key, value)
+            self._pending.discard(key)
+        return value
+
+    def _materialize_all(self):
+        for key in list(self._pending):
+            self._lookup(key)
+
+    def __iter__(self):
+        # Overriding __iter__ keeps dict() and dict.update() from
+        # copying the raw values directly
+        return super(LazyCurieDict, self).__iter__()
+
+    def __getitem__(self, key):
+        # dict() and dict.update() look up each key they iterated over,
+        # which must not be rewritten with the default curie
+        if dict.__contains__(self, key):
+            return self._lookup(key)
+        return super(LazyCurieDict, self).__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self._pending.discard(key)
+        super(LazyCurieDict, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._pending.discard(key)
+        super(LazyCurieDict, self).__delitem__(key)
+
+    def __eq__(self, other):
+        self._materialize_all()
+        return super(LazyCurieDict, self).__eq__(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        self._materialize_all()
+        return super(LazyCurieDict, self).__repr__()
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self._lookup(key)
+        return default
+
+    def values(self):
+        return [self._lookup(key) for key in self.keys()]
+
+    def items(self):
+        return [(key, self._lookup(key)) for key in self.keys()]
+
+    def copy(self):
+        self._materialize_all()
+        return CurieDict(self.default_curie, self)
+
+    def pop(self, key, *default):
+        if dict.__contains__(self, key):
+            value = self._lookup(key)
+            del self[key]
+            return value
+        return super(LazyCurieDict, self).pop(key, *default)
+
+    def popitem(self):
+        self._materialize_all()
+        return super(LazyCurieDict, self).popitem()
+
+    def setdefault(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self._lookup(key)
+        self[key] = default
+        return default
+
+    def update(self, *args, **kwargs):
+        for key in dict(*args, **kwargs):
+            self._pending.discard(key)
+        super(LazyCurieDict, self).update(*args, **kwargs)
+
+
+class LazyList(list):
+    '''list whose items are created from raw items the first time they
+    are accessed. `factory` is called with the raw item, and its result
+    replaces the raw item. Modifying the list creates all items.
+    '''
+
+    __slots__ = ('_factory', '_pending')
+
+    def __init__(self, items, factory):
+        super(LazyList, self).__init__(items)
+        self._factory = factory
+        self._pending = bytearray(b'\x01') * len(self)
+
+    def _materialize(self, index):
+        value = super(LazyList, self).__getitem__(index)
+        if self._pending is not None and self._pending[index]:
+            value = self._factory(value)
+            super(LazyList, self).__setitem__(index, value)
+            self._pending[index] = 0
+        return value
+
+    def _materialize_all(self):
+        if self._pending is not None:
+            for index in range(len(self)):
+                self._materialize(index)
+            self._pending = None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._materialize(i)
+                    for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('list index out of range')
+        return self._materialize(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._materialize(index)
+
+    def __reversed__(self):
+        for index in reversed(range(len(self))):
+            yield self._materialize(index)
+
+    def __contains__(self, value):
+        return any(item == value for item in self)
+
+    def __eq__(self, other):
+        self._materialize_all()
+        return super(LazyList, self).__eq__(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        self._materialize_all()
+        return super(LazyList, self).__repr__()
+
+    def index(self, value, *args):
+        self._materialize_all()
+        return super(LazyList, self).index(value, *args)
+
+    def count(self, value):
+        self._materialize_all()
+        return super(LazyList, self).count(value)
+
+
+def _materializing(method):
+    '''Wraps a list method so that all items are created first'''
+    def wrapper(self, *args, **kwargs):
+        self._materialize_all()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__add__', '__mul__',
+              '__rmul__', '__imul__', 'append', 'extend', 'insert', 'pop',
+              'remove', 'reverse', 'sort', 'copy'):
+    if hasattr(list, _name):  # list.copy is new in python 3
+        setattr(LazyList, _name, _materializing(getattr(list, _name)))
 
 
 def getpath(d, json_path, default=None, sep='.'):
@@ -275,4 +614,217 @@ def getstate(d):
     cpd = copy.deepcopy(d)
     cpd.pop('_links', None)
     cpd.pop('_embedded', None)
-    return cpd
\ No newline at end of file
+    return cpd
+
+
+def split_hal(doc):
+    '''Splits a decoded HAL document into its state, _links and
+    _embedded, in a single pass and without copying. The document
+    itself is modified to become the state, so this should only be
+    used on documents that aren't referenced anywhere else.
+    '''
+    if not isinstance(doc, dict):
+        raise TypeError("Can only get the state of a dictionary")
+    links = doc.pop('_links', None) or {}
+    embedded = doc.pop('_embedded', None) or {}
+    return doc, links, embedded
+
+
+class _JSONStream(object):
+    '''Scans json text that arrives in chunks, keeping only the text
+    that hasn't been consumed yet'''
+
+    WHITESPACE = ' \t\n\r'
+    # Consumed text is dropped from the buffer past this many characters
+    COMPACT_AFTER = 65536
+    STRING_SPECIAL = re.compile(r'["\\]')
+    STRUCTURE = re.compile(r'["{}\[\]]')
+    SCALAR_END = re.compile(r'[\s,:}\]]')
+    # The text outside of strings in a value: separators and literals
+    LITERALS = re.compile(
+        r'(?:[\s,:]+|(?:true|false|null)(?!\w)'
+        r'|-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?(?![\w.+-]))*')
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def read(self):
+        '''Appends the next chunk of text to the buffer. Returns False
+        if there is no more text'''
+        if self.pos > self.COMPACT_AFTER:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.buf += chunk
+                return True
+        self.exhausted = True
+        return False
+
+    def peek(self):
+        '''Returns the next character that isn't whitespace without
+        consuming it, or an empty string at the end of the text'''
+        while True:
+            while self.pos < len(self.buf) \
+                    and self.buf[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.read():
+                return ''
+
+    def expect(self, char):
+        '''Consumes the next character, which must be `char`'''
+        found = self.peek()
+        if found != char:
+            raise ValueError('Expected {0!r} in json stream, found {1!r}'
+                             .format(char, found))
+        self.pos += 1
+
+    def _scan(self, consume=False):
+        '''Returns the end of the next json value in the buffer, reading
+        chunks until it is complete. The text is scanned once, tracking
+        strings and nesting without decoding anything. If `consume` is
+        True, the text is consumed as it is scanned so that it can be
+        dropped from the buffer before the end of the value. As it won't
+        be decoded, the literals outside of its strings are checked
+        then, though not the placement of its separators.'''
+        first = self.peek()
+        if not first:
+            raise ValueError('Unexpected end of json stream')
+        scalar = first not in '"{['
+        in_string = first == '"'
+        depth = 1 if first in '{[' else 0
+        i = self.pos if scalar else self.pos + 1
+        while True:
+            buf = self.buf
+            if scalar:
+                match = self.SCALAR_END.search(buf, i)
+                if match is not None:
+                    if consume:
+                        self._check_literals(buf, self.pos, match.start(),
+                                             scalar=True)
+                    return match.start()
+                i = len(buf)
+            while not scalar:
+                if in_string:
+                    match = self.STRING_SPECIAL.search(buf, i)
+                    if match is None:
+                        i = len(buf)
+                        break
+                    i = match.end()
+                    if match.group() == '\\':
+                        if i == len(buf):
+                            i -= 1  # the escaped character is in the next chunk
+                            break
+                        i += 1
+                        continue
+                    in_string = False
+                    if depth == 0:
+                        return i
+                else:
+                    match = self.STRUCTURE.search(buf, i)
+                    if match is None:
+                        if not consume:
+                            i = len(buf)
+                        # else the literals are checked once complete
+                        break
+                    if consume:
+                        self._check_literals(buf, i, match.start())
+                    i = match.end()
+                    char = match.group()
+                    if char == '"':
+                        in_string = True
+                    elif char in '{[':
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if depth == 0:
+                            return i
+            if consume and not scalar:
+                self.pos = i
+            offset = i - self.pos
+            if not self.read():
+                if scalar:
+                    if consume:
+                        self._check_literals(self.buf, self.pos,
+                                             len(self.buf), scalar=True)
+                    return len(self.buf)
+                raise ValueError('Unexpected end of json stream')
+            i = self.pos + offset
+
+    def _check_literals(self, buf, start, end, scalar=False):
+        '''Raises ValueError unless the text between `start` and `end`
+        is made of separators and json literals, or is a single literal
+        if `scalar` is True'''
+        valid = self.LITERALS.match(buf, start, end).end() == end
+        if not valid or scalar and start == end:
+            raise ValueError('Invalid json value in stream: {0!r}'
+                             .format(buf[start:end]))
+
+    def value(self):
+        '''Consumes and decodes the next complete json value'''
+        end = self._scan()
+        value, decoded_end = self._decoder.raw_decode(self.buf, self.pos)
+        if decoded_end != end:
+            raise ValueError('Invalid json value in stream')
+        self.pos = end
+        return value
+
+    def skip(self):
+        '''Consumes the next json value without decoding it or keeping
+        all of its text in memory'''
+        self.pos = self._scan(consume=True)
+
+
+def iter_json_array(chunks, path):
+    '''Yields the items of an array nested in a json object, decoding
+    the text incrementally as its chunks arrive. Only one item at a time
+    is held in memory, so arrays of any size can be processed.
+
+    `path` is a sequence of keys leading to the array from the top
+    level object. Each key may also be a collection of alternative
+    keys. If the value at the path is not an array, it is yielded by
+    itself. Nothing is yielded if the path doesn't exist. Values before
+    the array are scanned over without being decoded or kept in memory,
+    and text after it isn't read.
+    '''
+    path = [frozenset([key]) if isinstance(key, six.string_types)
+            else frozenset(key) for key in path]
+    return _iter_json_path(_JSONStream(chunks), path)
+
+
+def _iter_json_path(stream, path):
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key in path[0]:
+            if len(path) > 1 and stream.peek() == '{':
+                for item in _iter_json_path(stream, path[1:]):
+                    yield item
+                return
+            elif len(path) == 1 and stream.peek() == '[':
+                stream.expect('[')
+                if stream.peek() == ']':
+                    return
+                while True:
+                    yield stream.value()
+                    if stream.peek() != ',':
+                        stream.expect(']')
+                        return
+                    stream.expect(',')
+            elif len(path) == 1:
+                yield stream.value()
+                return
+        stream.skip()  # values that aren't on the path
+        if stream.peek() != ',':
+            stream.expect('}')
+            return
+        stream.expect(',')
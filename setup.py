@@ -16,6 +16,9 @@ install_requires = [
 if sys.version_info < (2, 7, 0):
     install_requires.append('ordereddict')
 
+if sys.version_info < (3, 2, 0):
+    install_requires.append('futures')
+
 
 class Tox(TestCommand):
 
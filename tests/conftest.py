@@ -1,6 +1,8 @@
 '''Common fixtures and functions for test files'''
 
+import os
 import pytest
+import sys
 import random
 import string
 
@@ -24,3 +26,15 @@ def random_paragraph(mean_length=4):
 def random_paragraphs(mean_length=5):
     return '\n\t'.join(
         random_paragraph() for _ in range(jitter(mean_length)))
+
+# asyncio support needs async generators
+collect_ignore = []
+if sys.version_info < (3, 6):
+    collect_ignore.append('test_aio.py')
+# the benchmark tools use the python 3 standard library
+if sys.version_info < (3,):
+    collect_ignore.append('test_benchmarks.py')
+else:
+    # they aren't installed, import them from the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
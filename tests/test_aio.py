@@ -0,0 +1,294 @@
+'''Tests for restnavigator.aio'''
+
+import asyncio
+import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+from socketserver import ThreadingMixIn
+import threading
+
+import httpretty
+import pytest
+
+import restnavigator as RN
+from restnavigator import aio, exc, ratelimit, retry
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@pytest.fixture
+def http():
+    httpretty.HTTPretty.enable()
+    yield httpretty.HTTPretty
+    httpretty.HTTPretty.disable()
+    httpretty.HTTPretty.reset()
+
+
+@pytest.fixture
+def index_uri():
+    return 'http://async.example/api/'
+
+
+def register(uri, doc, method='GET', status=200, **kwargs):
+    httpretty.HTTPretty.register_uri(
+        method,
+        uri=uri,
+        body=json.dumps(doc),
+        status=status,
+        content_type='application/hal+json',
+        **kwargs
+    )
+
+
+@pytest.fixture
+def api(http, index_uri):
+    register(index_uri, {
+        '_links': {
+            'self': {'href': index_uri},
+            'xx:pages': {'href': index_uri + 'pages/1'},
+            'xx:hosts': {'href': index_uri + 'hosts'},
+            'curies': [{'name': 'xx', 'href': index_uri + 'rels/{rel}',
+                        'templated': True}],
+        },
+        'name': 'index',
+    })
+    for i in range(1, 4):
+        links = {'self': {'href': index_uri + 'pages/' + str(i)}}
+        if i < 3:
+            links['next'] = {'href': index_uri + 'pages/' + str(i + 1)}
+        register(index_uri + 'pages/' + str(i), {'_links': links, 'page': i})
+    register(index_uri + 'hosts', {}, method='POST', status=201,
+             location=index_uri + 'hosts/1')
+
+
+@pytest.fixture
+def N(index_uri):
+    return RN.Navigator.hal_async(index_uri, default_curie='xx')
+
+
+def test_hal_async_type(N):
+    assert isinstance(N, aio.AsyncHALNavigator)
+    assert isinstance(N._core.transport, aio.ThreadedTransport)
+
+
+def test_fetch(N, api):
+    assert run(N.fetch()) == {'name': 'index'}
+    assert N.status == (200, 'OK')
+
+
+def test_traversal(N, api, index_uri):
+    page2 = run(N['pages', 'next'])
+    assert isinstance(page2, aio.AsyncHALNavigator)
+    assert page2.uri == index_uri + 'pages/2'
+    assert run(page2()) == {'page': 2}
+
+
+def test_identity_map_shared(N, api):
+    page1 = run(N['pages'])
+    assert run(N['xx:pages']) is page1
+    assert N._core.get_cached(page1.uri) is page1
+
+
+def test_bad_rel(N, api):
+    with pytest.raises(exc.OffTheRailsException):
+        run(N['nothere'])
+
+
+def test_async_iteration(N, api):
+    async def collect():
+        start = await N['pages']
+        return [nav async for nav in start]
+    pages = run(collect())
+    assert [p.state['page'] for p in pages] == [1, 2, 3]
+
+
+def test_create(N, api, index_uri):
+    created = run(_create(N))
+    assert isinstance(created, aio.AsyncHALNavigator)
+    assert created.uri == index_uri + 'hosts/1'
+    assert not created.fetched
+
+
+async def _create(N):
+    hosts = await N['hosts']
+    return await hosts.create({'name': 'foo'})
+
+
+def test_concurrent_fetches(N, api):
+    async def fetch_all():
+        index = await N['pages']
+        navs = [index] + [await index['next'], await index['next', 'next']]
+        return await asyncio.gather(*[nav.fetch() for nav in navs])
+    assert [s['page'] for s in run(fetch_all())] == [1, 2, 3]
+
+
+class LocalAPI(ThreadingMixIn, HTTPServer):
+    '''A local server for the transports that don't go through
+    httpretty. `responses` maps a path to a list of (status, headers,
+    document) answered in turn, the last one repeatedly'''
+
+    daemon_threads = True
+
+    def __init__(self, responses):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), LocalAPIHandler)
+        self.responses = responses
+        self.requests = []
+
+    @property
+    def root(self):
+        return 'http://{0}:{1}/'.format(*self.server_address[:2])
+
+
+class LocalAPIHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def _answer(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.requests.append(
+            (self.command, self.path, dict(self.headers), body))
+        answers = self.server.responses.get(self.path)
+        if not answers:
+            status, headers, doc = 404, {'Content-Type': 'text/plain'}, None
+        else:
+            status, headers, doc = answers.pop(0) if len(answers) > 1 \
+                else answers[0]
+        payload = b'' if doc is None else json.dumps(doc).encode('utf-8')
+        self.send_response(status)
+        if doc is not None:
+            self.send_header('Content-Type', 'application/hal+json')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = _answer
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def local_api():
+    server = LocalAPI({})
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def aiohttp_nav(uri, **kwargs):
+    pytest.importorskip('aiohttp')
+    return RN.Navigator.hal_async(
+        uri, transport=aio.AiohttpTransport(), **kwargs)
+
+
+async def _closing(N, coro):
+    try:
+        return await coro
+    finally:
+        await N._core.transport.close()
+
+
+def test_aiohttp_fetch(local_api):
+    root = local_api.root
+    local_api.responses['/'] = [(200, {'ETag': '"v1"'}, {
+        '_links': {'self': {'href': root}, 'next': {'href': root + 'two'}},
+        'name': 'index',
+    })]
+    local_api.responses['/two'] = [(200, {}, {'_links': {}, 'page': 2})]
+    N = aiohttp_nav(root, headers={'X-Custom': 'yes'})
+
+    async def walk():
+        state = await N.fetch()
+        two = await N['next']
+        return state, await two()
+    state, two = run(_closing(N, walk()))
+    assert state == {'name': 'index'}
+    assert two == {'page': 2}
+    assert N.status == (200, 'OK')
+    assert N.response.headers['ETag'] == '"v1"'
+    assert N.response.request.method == 'GET'
+    method, path, headers, _ = local_api.requests[0]
+    assert headers['X-Custom'] == 'yes'
+    assert 'hal+json' in headers['Accept']
+
+
+def test_aiohttp_create(local_api):
+    root = local_api.root
+    local_api.responses['/'] = [
+        (201, {'Location': root + 'hosts/1'}, None)]
+    N = aiohttp_nav(root)
+    created = run(_closing(N, N.create({'name': 'foo'})))
+    assert created.uri == root + 'hosts/1'
+    method, _, headers, body = local_api.requests[0]
+    assert method == 'POST'
+    assert headers['Content-Type'] == 'application/json'
+    assert json.loads(body.decode('utf-8')) == {'name': 'foo'}
+
+
+def test_aiohttp_error(local_api):
+    N = aiohttp_nav(local_api.root + 'missing')
+    with pytest.raises(exc.HALNavigatorError) as excinfo:
+        run(_closing(N, N.fetch()))
+    assert excinfo.value.status == 404
+
+
+def test_aiohttp_retries(local_api):
+    local_api.responses['/'] = [
+        (503, {}, None),
+        (200, {}, {'_links': {}, 'ok': True}),
+    ]
+    N = aiohttp_nav(local_api.root, retry_policy=retry.RetryPolicy(
+        backoff=0.01))
+    assert run(_closing(N, N.fetch())) == {'ok': True}
+    assert len(local_api.requests) == 2
+    assert N._core.stats()['retry_policy']['retried_statuses'] == 1
+
+
+def test_aiohttp_retry_after(local_api):
+    local_api.responses['/'] = [
+        (429, {'Retry-After': '0'}, None),
+        (200, {}, {'_links': {}, 'ok': True}),
+    ]
+    N = aiohttp_nav(local_api.root, rate_limiter=ratelimit.RateLimiter())
+    assert run(_closing(N, N.fetch())) == {'ok': True}
+    assert len(local_api.requests) == 2
+    assert N._core.stats()['rate_limiter']['retried_after'] == 1
+
+
+def test_aiohttp_cookies(local_api):
+    root = local_api.root
+    local_api.responses['/'] = [(200, {'Set-Cookie': 'session=abc; Path=/'}, {
+        '_links': {'next': {'href': root + 'two'}},
+    })]
+    local_api.responses['/two'] = [(200, {}, {'_links': {}})]
+    N = aiohttp_nav(root)
+
+    async def walk():
+        await N.fetch()
+        two = await N['next']
+        await two()
+    run(_closing(N, walk()))
+    assert N._core.session.cookies.get('session') == 'abc'
+    assert N.response.cookies.get('session') == 'abc'
+    _, _, headers, _ = local_api.requests[1]
+    assert headers['Cookie'] == 'session=abc'
+
+
+def test_aiohttp_elapsed(local_api):
+    local_api.responses['/'] = [(200, {}, {'_links': {}})]
+    N = aiohttp_nav(local_api.root)
+    run(_closing(N, N.fetch()))
+    assert N.response.elapsed > datetime.timedelta(0)
@@ -0,0 +1,100 @@
+'''Tests for the benchmark tools'''
+
+import json
+
+import requests
+
+from benchmarks import replay, suite
+from benchmarks.halserver import HALServer
+
+
+def test_read_log():
+    lines = [
+        '{"ts": 20, "start": "https://api.example/b", "rels": ["x", "y"]}\n',
+        '\n',
+        '{"ts": 10.5, "start": "https://api.example/a"}\n',
+    ]
+    assert replay.read_log(lines) == [
+        (10.5, 'https://api.example/a', ()),
+        (20.0, 'https://api.example/b', ('x', 'y')),
+    ]
+
+
+def test_percentiles():
+    samples = [i / 1000.0 for i in range(100, 0, -1)]
+    result = replay.percentiles(samples)
+    assert result == {'p50': 50.0, 'p90': 90.0, 'p99': 99.0}
+    assert replay.percentiles([0.002], points=(50,)) == {'p50': 2.0}
+    assert replay.percentiles([]) == {'p50': None, 'p90': None, 'p99': None}
+
+
+def test_halserver():
+    server = HALServer(rels=['ht:customer', 'orders'], max_age=60).start()
+    try:
+        assert server.local_uri('https://api.example/a/b?page=2') == \
+            server.root + 'a/b?page=2'
+        response = requests.get(server.root + 'orders?page=2')
+        doc = response.json()
+        assert doc['_links'] == {
+            'self': {'href': '/orders?page=2'},
+            'ht:customer': {'href': '/orders/ht%3Acustomer'},
+            'orders': {'href': '/orders/orders'},
+        }
+        assert response.headers['Cache-Control'] == 'max-age=60'
+        revalidated = requests.get(server.root + 'orders?page=2', headers={
+            'If-None-Match': response.headers['ETag']})
+        assert revalidated.status_code == 304
+        assert (server.requests, server.not_modified) == (2, 1)
+    finally:
+        server.stop()
+
+
+def test_halserver_documents():
+    server = HALServer(documents=lambda path: (
+        {'_links': {}, 'path': path} if path == '/found' else None),
+        etags=False).start()
+    try:
+        found = requests.get(server.root + 'found')
+        assert found.json() == {'_links': {}, 'path': '/found'}
+        assert 'ETag' not in found.headers
+        assert requests.get(server.root + 'missing').status_code == 404
+    finally:
+        server.stop()
+
+
+def test_replay():
+    records = replay.read_log([
+        json.dumps({'ts': 1, 'start': 'https://api.example/orders',
+                    'rels': ['customer']}),
+        json.dumps({'ts': 2, 'start': 'https://api.example/orders/1'}),
+    ])
+    report = replay.replay(records, speed=0, concurrency=2, cache_size=10)
+    assert report['traversals'] == 2
+    assert report['errors'] == 0
+    # orders, its customer and orders/1
+    assert report['requests'] == report['server']['requests'] == 3
+    assert report['response_cache']['misses'] == 3
+    assert set(report['traversal_latency_ms']) == set(['p50', 'p90', 'p99'])
+    assert report['traversals_per_second'] > 0
+
+
+def test_replay_empty():
+    report = replay.replay([], speed=0)
+    assert report['traversals'] == 0
+    assert report['traversals_per_second'] is None
+
+
+def test_suite_smoke():
+    results = suite.run(width=3, depth=2, length=4, size_kb=1, repeat=2)
+    assert results['config'] == {
+        'width': 3, 'depth': 2, 'length': 4, 'size_kb': 1, 'repeat': 2}
+    for key in ('fetches_per_second', 'ingest_ms_per_mb'):
+        assert set(results[key]) == set(suite.SHAPES)
+        assert all(value > 0 for value in results[key].values())
+    assert set(results['traversal_ms']) == set(['chain_hop', 'deep'])
+    memory = results['memory_bytes']
+    for key in ('link', 'partial_navigator', 'hal_navigator'):
+        assert memory[key] > 0
+        assert memory['without_slots'][key] > 0
+    assert memory['chain_navigator'] > 0
+    json.dumps(results)  # the report is printed as json
@@ -0,0 +1,219 @@
+'''Tests for restnavigator.cache'''
+
+import pytest
+import requests
+
+from restnavigator import cache
+
+
+@pytest.fixture
+def entry():
+    response = requests.Response()
+    response.headers['Cache-Control'] = 'max-age=60'
+    return cache.CacheEntry(
+        response=response, etag='"abc"', last_modified='yesterday')
+
+
+def test_ResponseCache__evicts_lru(entry):
+    rc = cache.ResponseCache(maxsize=2)
+    rc.put('a', entry)
+    rc.put('b', entry)
+    rc.get('a')
+    rc.put('c', entry)
+    assert 'a' in rc
+    assert 'b' not in rc
+    assert 'c' in rc
+    assert len(rc) == 2
+
+
+def test_ResponseCache__disabled(entry):
+    rc = cache.ResponseCache(maxsize=0)
+    rc.put('a', entry)
+    assert rc.get('a') is None
+
+
+def test_CacheEntry__conditional_headers(entry):
+    assert entry.conditional_headers() == {
+        'If-None-Match': '"abc"',
+        'If-Modified-Since': 'yesterday',
+    }
+
+
+def test_CacheEntry__revalidate(entry):
+    assert not entry.is_fresh()
+    entry.revalidate({'ETag': '"def"'})
+    assert entry.etag == '"def"'
+    assert entry.last_modified == 'yesterday'
+    assert entry.is_fresh()
+
+
+@pytest.mark.parametrize(('headers', 'default_ttl', 'expected'), [
+    ({}, None, 0),
+    ({}, 30, 30),
+    ({'Cache-Control': 'max-age=60'}, 30, 60),
+    ({'Cache-Control': 'public, max-age=60', 'Age': '20'}, None, 40),
+    ({'Cache-Control': 'max-age=60', 'Age': '100'}, None, 0),
+    ({'Cache-Control': 'no-cache, max-age=60'}, 30, 0),
+    ({'Cache-Control': 'no-store'}, 30, None),
+    ({'Expires': 'Thu, 01 Dec 1994 16:10:00 GMT',
+      'Date': 'Thu, 01 Dec 1994 16:00:00 GMT'}, None, 600),
+    ({'Expires': '0'}, 30, 0),
+])
+def test_freshness_lifetime(headers, default_ttl, expected):
+    assert cache.freshness_lifetime(headers, default_ttl) == expected
+
+
+def test_ResponseCache__stats(entry):
+    rc = cache.ResponseCache(maxsize=4)
+    rc.put('a', entry)
+    rc.record('hits')
+    rc.record('hits')
+    rc.record('misses')
+    assert rc.stats() == {
+        'hits': 2,
+        'revalidations': 0,
+        'misses': 1,
+        'size': 1,
+        'maxsize': 4,
+    }
+
+
+class Nav(object):
+    '''Stands in for a navigator, which must be weakly referenceable'''
+
+
+def test_WeakIdentityMap__counts():
+    id_map = cache.WeakIdentityMap()
+    nav = Nav()
+    id_map['a'] = nav
+    assert id_map.get('a') is nav
+    assert id_map.get('b') is None
+    del nav
+    assert id_map.get('a') is None
+    assert id_map.stats() == {
+        'hits': 1, 'misses': 2, 'evictions': 0, 'size': 0}
+
+
+def test_LRUIdentityMap__evicts_lru():
+    id_map = cache.LRUIdentityMap(maxsize=2)
+    id_map['a'] = Nav()
+    id_map['b'] = Nav()
+    id_map.get('a')
+    id_map['c'] = Nav()
+    assert 'a' in id_map
+    assert 'b' not in id_map
+    assert 'c' in id_map
+    assert id_map.evictions == 1
+    assert id_map.stats()['maxsize'] == 2
+
+
+def test_LRUIdentityMap__ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    id_map = cache.LRUIdentityMap(ttl=10)
+    nav = Nav()
+    id_map['a'] = nav
+    now[0] += 5
+    assert id_map.get('a') is nav
+    now[0] += 5
+    assert id_map.get('a') is None
+    assert len(id_map) == 0
+    assert id_map.stats() == {
+        'hits': 1, 'misses': 1, 'evictions': 1, 'size': 0, 'maxsize': 1024}
+
+
+def make_response(uri, body=b'{}', **headers):
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response.url = uri
+    response.headers.update(headers)
+    response._content = body
+    response.request = requests.Request('GET', uri, headers={
+        'Accept': 'application/hal+json'}).prepare()
+    return response
+
+
+def test_SQLiteResponseCache__persists(tmpdir):
+    path = str(tmpdir.join('cache.db'))
+    rc = cache.SQLiteResponseCache(path)
+    response = make_response('http://a/', b'{"a": 1}', ETag='"v1"')
+    rc.put('http://a/', cache.CacheEntry.from_response(response))
+    rc.close()
+
+    rc = cache.SQLiteResponseCache(path)
+    entry = rc.get('http://a/')
+    assert not entry.ingested
+    assert entry.etag == '"v1"'
+    assert entry.response.content == b'{"a": 1}'
+    assert entry.response.headers['etag'] == '"v1"'
+    assert rc.stats()['loads'] == 1
+    rc.close()
+
+
+def test_SQLiteResponseCache__vary(tmpdir):
+    rc = cache.SQLiteResponseCache(str(tmpdir.join('cache.db')))
+    response = make_response('http://a/', ETag='"v1"', Vary='Accept')
+    rc.put('http://a/', cache.CacheEntry.from_response(response))
+    rc.forget('http://a/')
+    assert rc.get('http://a/', headers={'Accept': 'text/html'}) is None
+    assert rc.get(
+        'http://a/', headers={'accept': 'application/hal+json'}) is not None
+
+
+def test_SQLiteResponseCache__max_stored(tmpdir):
+    rc = cache.SQLiteResponseCache(str(tmpdir.join('cache.db')), max_stored=2)
+    for uri in ('http://a/', 'http://b/', 'http://c/'):
+        rc.put(uri, cache.CacheEntry.from_response(
+            make_response(uri, ETag='"v1"')))
+    assert rc.stats()['stored'] == 2
+
+
+def test_SQLiteResponseCache__prunes_periodically(tmpdir):
+    rc = cache.SQLiteResponseCache(str(tmpdir.join('cache.db')), max_stored=20)
+    for i in range(50):
+        uri = 'http://a/{0}'.format(i)
+        rc.put(uri, cache.CacheEntry.from_response(
+            make_response(uri, ETag='"v1"')))
+        assert rc.stats()['stored'] <= 22
+    rc.forget('http://a/49')
+    rc.forget('http://a/0')
+    assert rc.get('http://a/49') is not None
+    assert rc.get('http://a/0') is None
+    rc.close()
+
+
+def test_SQLiteResponseCache__refreshes_one_variant(tmpdir):
+    path = str(tmpdir.join('cache.db'))
+    rc = cache.SQLiteResponseCache(path)
+    for accept, etag in (('application/json', '"j"'), ('text/html', '"h"')):
+        response = make_response('http://a/', ETag=etag, Vary='Accept')
+        response.request.headers['Accept'] = accept
+        rc.put('http://a/', cache.CacheEntry.from_response(response))
+    rc.close()
+
+    rc = cache.SQLiteResponseCache(path)
+    entry = rc.get('http://a/', headers={'Accept': 'text/html'})
+    entry.revalidate({'ETag': '"h2"'})
+    rc.refreshed('http://a/', entry)
+    rc.forget('http://a/')
+    assert rc.get('http://a/', headers={'Accept': 'text/html'}).etag == '"h2"'
+    rc.forget('http://a/')
+    assert rc.get(
+        'http://a/', headers={'Accept': 'application/json'}).etag == '"j"'
+    rc.close()
+
+
+@pytest.mark.parametrize('store_private', [False, True])
+def test_SQLiteResponseCache__private(tmpdir, store_private):
+    rc = cache.SQLiteResponseCache(
+        str(tmpdir.join('cache.db')), store_private=store_private)
+    private = make_response(
+        'http://a/', ETag='"v1"', **{'Cache-Control': 'private, max-age=60'})
+    rc.put('http://a/', cache.CacheEntry.from_response(private))
+    authorized = make_response('http://b/', ETag='"v1"')
+    authorized.request.headers['Authorization'] = 'Bearer secret'
+    rc.put('http://b/', cache.CacheEntry.from_response(authorized))
+    assert 'http://a/' in rc and 'http://b/' in rc
+    assert rc.stats()['stored'] == (2 if store_private else 0)
+    rc.close()
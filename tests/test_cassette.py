@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+'''Tests for restnavigator.cassette'''
+
+from __future__ import unicode_literals
+
+import json
+
+import httpretty
+import pytest
+import requests
+
+import restnavigator as RN
+from restnavigator import cassette, exc
+
+
+@pytest.fixture
+def index_uri():
+    return 'http://cassette.example/api/'
+
+
+@pytest.fixture
+def recorded(index_uri, tmpdir):
+    '''Records a traversal from the index to a widget, and returns the
+    path of the cassette'''
+    path = str(tmpdir.join('traversal.jsonl'))
+    httpretty.HTTPretty.enable()
+    try:
+        httpretty.HTTPretty.register_uri(
+            'GET', index_uri, content_type='application/hal+json',
+            body=json.dumps({
+                '_links': {
+                    'self': {'href': index_uri},
+                    'widget': {'href': index_uri + 'widget'},
+                },
+            }))
+        httpretty.HTTPretty.register_uri(
+            'GET', index_uri + 'widget', content_type='application/hal+json',
+            body=json.dumps({
+                '_links': {'self': {'href': index_uri + 'widget'}},
+                'name': 'gizmo ☃',
+            }))
+        session = requests.Session()
+        adapter = cassette.record(session, path)
+        N = RN.Navigator.hal(index_uri, session=session)
+        assert N['widget']()['name'] == 'gizmo ☃'
+        adapter.close()
+    finally:
+        httpretty.HTTPretty.disable()
+        httpretty.HTTPretty.reset()
+    return path
+
+
+def test_record(recorded, index_uri):
+    interactions = cassette.load(recorded)
+    assert [i['request']['uri'] for i in interactions] == [
+        index_uri, index_uri + 'widget']
+    assert interactions[0]['response']['status'] == 200
+    assert interactions[0]['response']['elapsed'] >= 0
+
+
+def test_replay(recorded, index_uri):
+    session = requests.Session()
+    cassette.replay(session, recorded)
+    N = RN.Navigator.hal(index_uri, session=session)
+    assert N['widget']()['name'] == 'gizmo ☃'
+    assert N.status == (200, 'OK')
+
+
+def test_replay_not_recorded(recorded, index_uri):
+    session = requests.Session()
+    cassette.replay(session, recorded)
+    N = RN.Navigator.hal(index_uri + 'elsewhere', session=session)
+    with pytest.raises(exc.NotRecordedError):
+        N()
+
+
+@pytest.mark.parametrize('latency, scale, expected', [
+    (None, 1.0, 0),
+    (0.5, 2.0, 1.0),
+    (lambda interaction: 0.25, 1.0, 0.25),
+])
+def test_replay_latency(latency, scale, expected):
+    adapter = cassette.ReplayAdapter([], latency=latency, scale=scale)
+    assert adapter._delay({'response': {'elapsed': 3}}) == expected
+
+
+def test_replay_recorded_latency():
+    adapter = cassette.ReplayAdapter([], latency=cassette.RECORDED)
+    assert adapter._delay({'response': {'elapsed': 3}}) == 3
+
+
+def test_replay_in_order():
+    interactions = [
+        {'request': {'method': 'GET', 'uri': 'http://a/'},
+         'response': {'status': status, 'body': '{}'}}
+        for status in (500, 200)
+    ]
+    session = requests.Session()
+    session.mount('http://', cassette.ReplayAdapter(interactions))
+    statuses = [session.get('http://a/').status_code for _ in range(3)]
+    assert statuses == [500, 200, 200]
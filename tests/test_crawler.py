@@ -0,0 +1,178 @@
+'''Tests for restnavigator.crawler'''
+
+import json
+
+import httpretty
+import pytest
+
+import restnavigator as RN
+from restnavigator import crawler
+
+
+@pytest.fixture
+def http():
+    httpretty.HTTPretty.enable()
+    yield httpretty.HTTPretty
+    httpretty.HTTPretty.disable()
+    httpretty.HTTPretty.reset()
+
+
+@pytest.fixture
+def index_uri():
+    return 'http://crawl.example/api/'
+
+
+def register(uri, doc, status=200):
+    httpretty.HTTPretty.register_uri(
+        'GET',
+        uri=uri,
+        body=json.dumps(doc),
+        status=status,
+        content_type='application/hal+json',
+    )
+
+
+@pytest.fixture
+def api(http, index_uri):
+    '''An index linking to a tree of 3 sections of 3 items each, which
+    link back to the index. Section 2 embeds its items'''
+    sections = []
+    for s in range(3):
+        section_uri = index_uri + 'sections/{0}'.format(s)
+        sections.append({'href': section_uri})
+        items = []
+        for i in range(3):
+            item_uri = section_uri + '/items/{0}'.format(i)
+            items.append({'_links': {'self': {'href': item_uri}}, 'n': i})
+            register(item_uri, {
+                '_links': {'self': {'href': item_uri},
+                           'up': {'href': index_uri}},
+                'n': i,
+            })
+        doc = {'_links': {'self': {'href': section_uri}}}
+        if s == 2:
+            doc['_embedded'] = {'item': items}
+        else:
+            doc['_links']['item'] = [
+                {'href': item['_links']['self']['href']} for item in items]
+        register(section_uri, doc)
+    register(index_uri, {
+        '_links': {
+            'self': {'href': index_uri},
+            'section': sections,
+            'search': {'href': index_uri + 'search{?q}', 'templated': True},
+            'broken': {'href': index_uri + 'broken'},
+        },
+    })
+    register(index_uri + 'broken', {'error': 'nope'}, status=500)
+    return RN.Navigator.hal(index_uri)
+
+
+def test_crawls_everything_once(api, index_uri, http):
+    navs = list(RN.crawl(api, concurrency=4, per_host=2))
+    uris = [nav.uri for nav in navs]
+    assert len(uris) == len(set(uris)) == 1 + 1 + 3 + 9
+    assert uris[0] == index_uri
+    assert all(nav.resolved for nav in navs)
+    # The items embedded in section 2 aren't fetched
+    assert len(http.latest_requests) == len(uris) - 3
+
+
+def test_resolved_not_fetched_again(api, index_uri, http):
+    api.fetch()
+    requests_made = len(http.latest_requests)
+    navs = list(RN.crawl(api, rels=['section']))
+    assert navs[0] is api
+    assert len(http.latest_requests) == requests_made + 3
+
+
+def test_refresh(api, index_uri, http):
+    api.fetch()
+    requests_made = len(http.latest_requests)
+    navs = list(RN.crawl(api, refresh=True))
+    assert len(http.latest_requests) == requests_made + len(navs)
+
+
+def test_rels(api):
+    navs = list(RN.crawl(api, rels=['section']))
+    assert len(navs) == 4
+
+
+def test_max_depth(api):
+    navs = list(RN.crawl(api, max_depth=1))
+    assert len(navs) == 1 + 3 + 1
+
+
+def test_follow(api, index_uri):
+    navs = list(RN.crawl(
+        api, follow=lambda nav: not nav.uri.endswith('broken')))
+    assert index_uri + 'broken' not in [nav.uri for nav in navs]
+
+
+def test_errors_yielded(api, index_uri):
+    broken = [nav for nav in RN.crawl(api)
+              if nav.response is not None and not nav.response]
+    assert [nav.uri for nav in broken] == [index_uri + 'broken']
+
+
+def test_raise_exc(api):
+    with pytest.raises(RN.halnav.exc.HALNavigatorError):
+        list(crawler.crawl(api, raise_exc=True))
+
+
+def test_per_host_limit(api):
+    c = crawler.Crawler(api, concurrency=8, per_host=1)
+    in_flight = []
+    original = c._fetch
+    def fetch(nav):
+        in_flight.append(sum(c._in_flight.values()))
+        return original(nav)
+    c._fetch = fetch
+    assert len(list(c)) == 14
+    assert max(in_flight) == 1
+
+
+def test_checkpoint_resume(api, index_uri, tmpdir, http):
+    path = str(tmpdir.join('crawl.ckpt'))
+    first = []
+    for nav in RN.crawl(api, concurrency=1, per_host=1, checkpoint=path,
+                        checkpoint_every=2):
+        first.append(nav.uri)
+        if len(first) == 5:
+            break
+    frontier, visited = crawler.read_checkpoint(path)
+    assert frontier
+    assert all(crawler.uri_digest(uri) in visited for uri in first)
+
+    requests_made = len(http.latest_requests)
+    fresh = RN.Navigator.hal(index_uri)
+    rest = [nav.uri for nav in RN.crawl(fresh, checkpoint=path)]
+    assert len(http.latest_requests) == requests_made + len(rest)
+    assert not set(first) & set(rest)
+    assert len(first) + len(rest) == 14
+
+    # Finished, nothing left to crawl
+    assert list(RN.crawl(fresh, checkpoint=path)) == []
+
+
+def test_resume_conditional_with_cache_path(index_uri, http, tmpdir):
+    conditional = []
+    def body(request, url, headers):
+        headers['ETag'] = '"v1"'
+        if request.headers.get('If-None-Match') == '"v1"':
+            conditional.append(url)
+            return 304, headers, ''
+        return 200, headers, json.dumps({'_links': {'self': {'href': url}}})
+    httpretty.HTTPretty.register_uri(
+        'GET', index_uri, body=body, content_type='application/hal+json')
+    cache_path = str(tmpdir.join('cache.db'))
+    checkpoint = str(tmpdir.join('crawl.ckpt'))
+    # Fetched before the crash, but still in flight in the checkpoint
+    RN.Navigator.hal(index_uri, cache_path=cache_path).fetch()
+    crawler.write_checkpoint(checkpoint, [[index_uri, 0, None]],
+                             set([crawler.uri_digest(index_uri)]))
+    api = RN.Navigator.hal(index_uri, cache_path=cache_path)
+    api._core.response_cache.revalidate_in_background = False
+    navs = list(RN.crawl(api, checkpoint=checkpoint))
+    assert [nav.uri for nav in navs] == [index_uri]
+    assert conditional == [index_uri]
@@ -201,6 +201,15 @@ def test_HALNavigator__identity_map():
         assert page3 is page4['next']['next']
 
 
+def test_HALNavigator__compact():
+    N = HN.Navigator.hal('http://www.example.com')
+    partial = HN.PartialNavigator(HN.Link('http://www.example.com/{x}'),
+                                  core=N._core)
+    for obj in (N, N.self, partial, N._links):
+        assert not hasattr(obj, '__dict__')
+    assert N._core.get_cached(N.uri) is N
+
+
 def test_HALNavigator__iteration():
     r'''Test that a navigator with 'next' links can be used for iteration'''
     with httprettify():
@@ -1,6 +1,9 @@
 '''Refactored tests from test_hal_nav.py'''
 
+import gc
 import json
+import threading
+import time
 
 import httpretty
 import pytest
@@ -10,7 +13,7 @@ import conftest
 import uritemplate
 
 import restnavigator as RN
-from restnavigator import exc
+from restnavigator import cache, exc, json_backends, ratelimit, retry
 import restnavigator.halnav as HN
 
 
@@ -267,6 +270,29 @@ class TestHALNavGetItem:
             }
             last = new
 
+    def test_links_created_on_access(self, N, resources, rels):
+        N.fetch()
+        raw_link = dict.__getitem__(N._links, rels(0))
+        assert isinstance(raw_link, dict)
+        assert not N._core.is_cached(raw_link['href'])
+        linked = N.links()[rels(0)]
+        assert N._core.get_cached(raw_link['href']) is linked
+        assert linked.title == raw_link['title']
+
+    def test_links_copied_with_default_curie(self, index_uri, http):
+        doc = {
+            '_links': {
+                'self': {'href': index_uri + 'uncuried'},
+                'foo': {'href': index_uri + 'foo'},
+                'xx:bar': {'href': index_uri + 'bar'},
+            },
+        }
+        register_hal_page(doc)
+        N = RN.Navigator.hal(uri_of(doc), default_curie='xx')
+        links = dict(N.links())
+        assert sorted(links) == ['foo', 'self', 'xx:bar']
+        assert links['foo'].uri == index_uri + 'foo'
+
     def test_fetch_behavior(self, N, resources, rels):
         Na = N[rels(0)]
         Nb = N[rels(0), rels(1)]
@@ -491,6 +517,23 @@ class TestEmbedded:
         assert nested1_linked.resolved
         assert nested1 is nested1_linked
 
+    def test_embedded_created_on_access(self, N, page, index_uri):
+        item = page('lazy', 0)
+        del item['_links']['next']
+        item_uri = uri_of(item)
+        doc = {
+            '_links': {'self': {'href': index_uri + 'lazy'}},
+            '_embedded': {'item': [item]},
+        }
+        register_hal_page(doc)
+        nav = N._core.nav_class(HN.Link(uri_of(doc)), N._core)
+        nav.fetch()
+        assert not N._core.is_cached(item_uri)
+        assert len(nav.embedded()['item']) == 1
+        assert not N._core.is_cached(item_uri)
+        assert nav['item', 0] is N._core.get_cached(item_uri)
+        assert nav['item', 0].state['name'] == 'lazy'
+
     def test_cached_embedded_requests(self, N, index, http):
         N.fetch()
         main_nav_request = http.last_request
@@ -504,6 +547,18 @@ class TestEmbedded:
         embedded.fetch()
         assert main_nav_request is not http.last_request
 
+    def test_embedded_list_copies(self, N, index):
+        posts = N.embedded()['xx:posts']
+        copied = posts.copy()
+        doubled = posts * 2
+        for navs in (copied, doubled, 2 * N.embedded()['xx:posts']):
+            assert all(isinstance(nav, HN.HALNavigator) for nav in navs)
+        assert copied == list(posts)
+        assert doubled == list(posts) + list(posts)
+        posts *= 2
+        assert len(posts) == 6
+        assert all(isinstance(nav, HN.HALNavigator) for nav in posts)
+
 class TestCreate:
 
     @pytest.fixture
@@ -579,3 +634,757 @@ class TestCreate:
     def test_empty_post(self, N, index):
         # Just want to ensure no error is thrown
         N['xx:create-hosts'].create()
+
+
+class TestConditionalRequests:
+    '''tests for conditional GETs using cached validators'''
+
+    @pytest.fixture
+    def etag_page(self, index_uri, http):
+        '''Registers a page that answers If-None-Match with a 304'''
+        doc = {
+            '_links': {
+                'self': {'href': index_uri + 'etagged'},
+                'next': {'href': index_uri + 'etagged/2'},
+            },
+            'name': 'etagged',
+        }
+        def body_callback(request, url, headers):
+            headers['ETag'] = '"v1"'
+            if request.headers.get('If-None-Match') == '"v1"':
+                return 304, headers, ''
+            return 200, headers, json.dumps(doc)
+        http.register_uri(
+            'GET',
+            body=body_callback,
+            content_type='application/hal+json',
+            uri=uri_of(doc),
+        )
+        return doc
+
+    def test_validator_sent(self, etag_page, http):
+        N = RN.Navigator.hal(uri_of(etag_page))
+        N.fetch()
+        assert 'If-None-Match' not in http.last_request.headers
+        N.fetch()
+        assert http.last_request.headers['If-None-Match'] == '"v1"'
+
+    def test_not_modified_reuses_ingested(self, etag_page):
+        N = RN.Navigator.hal(uri_of(etag_page))
+        first_state = N.fetch()
+        links = N._links
+        second_state = N.fetch()
+        assert N.status == (304, 'Not Modified')
+        assert N._links is links
+        assert second_state == first_state == {'name': 'etagged'}
+
+    def test_cache_keeps_no_body(self, etag_page):
+        N = RN.Navigator.hal(uri_of(etag_page))
+        N.fetch()
+        assert N.response.content
+        entry = N._core.response_cache.get(N.uri)
+        assert entry.response.content == b''
+        assert entry.response.headers['ETag'] == '"v1"'
+        assert entry.state == {'name': 'etagged'}
+
+    def test_not_modified_new_navigator(self, etag_page):
+        N = RN.Navigator.hal(uri_of(etag_page))
+        N.fetch()
+        core = N._core
+        del N
+        core.id_map.clear()
+        N2 = HN.HALNavigator(HN.Link(uri_of(etag_page)), core)
+        assert N2.fetch() == {'name': 'etagged'}
+        assert N2.status == (304, 'Not Modified')
+        assert 'next' in N2
+
+    def test_counters(self, etag_page):
+        N = RN.Navigator.hal(uri_of(etag_page))
+        N.fetch()
+        N.fetch()
+        stats = N._core.response_cache.stats()
+        assert stats['misses'] == 1
+        assert stats['revalidations'] == 1
+        assert stats['hits'] == 0
+
+    def test_cache_disabled(self, etag_page, http):
+        N = RN.Navigator.hal(uri_of(etag_page), cache_size=0)
+        N.fetch()
+        N.fetch()
+        assert 'If-None-Match' not in http.last_request.headers
+        assert N.status == (200, 'OK')
+
+
+class TestFreshness:
+    '''tests for serving fresh responses without a request'''
+
+    @pytest.fixture
+    def fresh_page(self, index_uri, http):
+        '''Registers a page that may be cached for a minute'''
+        doc = {
+            '_links': {
+                'self': {'href': index_uri + 'fresh'},
+                'next': {'href': index_uri + 'fresh/2'},
+            },
+            'name': 'fresh',
+        }
+        register_hal_page(doc, adding_headers={'Cache-Control': 'max-age=60'})
+        return doc
+
+    def test_fresh_fetch_makes_no_request(self, fresh_page, http):
+        N = RN.Navigator.hal(uri_of(fresh_page))
+        N.fetch()
+        requests_made = len(http.latest_requests)
+        assert N.fetch() == {'name': 'fresh'}
+        assert len(http.latest_requests) == requests_made
+
+    def test_fresh_hit_keeps_body(self, fresh_page):
+        N = RN.Navigator.hal(uri_of(fresh_page))
+        N.fetch()
+        N.fetch()
+        assert N._core.response_cache.hits == 1
+        assert N.response.content
+        assert N.response.json()['name'] == 'fresh'
+
+    def test_hit_counted(self, fresh_page):
+        N = RN.Navigator.hal(uri_of(fresh_page))
+        N.fetch()
+        N.fetch()
+        assert N._core.response_cache.hits == 1
+        assert N._core.response_cache.misses == 1
+
+    def test_opt_out(self, fresh_page, http):
+        N = RN.Navigator.hal(uri_of(fresh_page))
+        N.fetch()
+        requests_made = len(http.latest_requests)
+        N.fetch(use_cache=False)
+        assert len(http.latest_requests) == requests_made + 1
+
+    def test_fresh_traversal(self, fresh_page, http):
+        N = RN.Navigator.hal(uri_of(fresh_page))
+        N.fetch()
+        core = N._core
+        core.id_map.clear()
+        requests_made = len(http.latest_requests)
+        N2 = HN.HALNavigator(HN.Link(uri_of(fresh_page)), core)
+        assert N2['next'].uri == fresh_page['_links']['next']['href']
+        assert len(http.latest_requests) == requests_made
+        assert N2.status == (200, 'OK')
+
+    def test_default_ttl(self, page, http):
+        doc = page('ttl', 0)
+        N = RN.Navigator.hal(uri_of(doc), default_ttl=60)
+        N.fetch()
+        requests_made = len(http.latest_requests)
+        N.fetch()
+        assert len(http.latest_requests) == requests_made
+
+    def test_no_ttl_refetches(self, page, http):
+        doc = page('ttl', 0)
+        N = RN.Navigator.hal(uri_of(doc))
+        N.fetch()
+        requests_made = len(http.latest_requests)
+        N.fetch()
+        assert len(http.latest_requests) == requests_made + 1
+
+    @pytest.fixture
+    def writable_uri(self, index_uri, http):
+        '''Registers a fresh resource whose state can be replaced with
+        PUT, and a collection that creates it with POST'''
+        uri = index_uri + 'writable'
+        current = {'v': 1}
+
+        def get(request, url, headers):
+            headers['Cache-Control'] = 'max-age=300'
+            return 200, headers, json.dumps(dict(current, _links={}))
+
+        def put(request, url, headers):
+            current.update(json.loads(request.body.decode('utf-8')))
+            return 204, headers, ''
+
+        def post(request, url, headers):
+            current.update(json.loads(request.body.decode('utf-8')))
+            headers['Location'] = uri
+            return 201, headers, ''
+        http.register_uri('GET', uri, body=get,
+                          content_type='application/hal+json')
+        http.register_uri('PUT', uri, body=put)
+        http.register_uri('POST', index_uri + 'collection', body=post)
+        return uri
+
+    def test_write_invalidates(self, writable_uri):
+        N = RN.Navigator.hal(writable_uri)
+        assert N.fetch() == {'v': 1}
+        N.upsert({'v': 2})
+        assert N.fetch() == {'v': 2}
+
+    def test_location_invalidated(self, writable_uri, index_uri):
+        N = RN.Navigator.hal(writable_uri)
+        assert N.fetch() == {'v': 1}
+        collection = HN.HALNavigator(HN.Link(index_uri + 'collection'),
+                                     N._core)
+        collection.create({'v': 3})
+        assert N.fetch() == {'v': 3}
+
+
+class TestFetchAll:
+    '''tests for fetching link lists concurrently'''
+
+    @pytest.fixture
+    def items(self, page, index_page, curify):
+        docs = [page('item', i) for i in range(10)]
+        index_page['_links'][curify('items')] = [
+            dict(link_to(doc), name='item' + str(i))
+            for i, doc in enumerate(docs)]
+        index_page['_links'][curify('missing')] = [
+            link_to(docs[0]), {'href': uri_of(docs[0]) + '/missing'}]
+        return docs
+
+    def test_fetch_all_in_order(self, N, items, curify):
+        linklist = N[curify('items')]
+        results = linklist.fetch_all(max_workers=4)
+        assert [r.state['number'] for r in results] == list(range(10))
+        assert all(nav.fetched for nav in linklist)
+
+    def test_fetch_all_reports_failures(self, N, items, curify, http):
+        http.register_uri('GET', uri_of(items[0]) + '/missing', status=404)
+        results = N[curify('missing')].fetch_all()
+        assert results[0].exception is None
+        assert isinstance(results[1].exception, exc.HALNavigatorError)
+        assert results[1].exception.status == 404
+
+
+class TestIterPages:
+    '''tests for iterating over next links'''
+
+    @pytest.fixture
+    def pages(self, page):
+        docs = [page('paged', i) for i in range(6)]
+        del docs[-1]['_links']['next']
+        return docs
+
+    @pytest.fixture
+    def first(self, pages):
+        return RN.Navigator.hal(uri_of(pages[0]))
+
+    @pytest.mark.parametrize('prefetch', [0, 1, 3])
+    def test_all_pages_in_order(self, first, pages, prefetch):
+        navs = list(first.iter_pages(prefetch=prefetch))
+        assert [nav.uri for nav in navs] == [uri_of(doc) for doc in pages]
+        assert all(nav.fetched for nav in navs)
+
+    def test_prefetches_ahead(self, first, pages):
+        iterator = first.iter_pages(prefetch=2)
+        nav = next(iterator)
+        following = nav.links()['next']
+        for _ in range(100):
+            if following.fetched:
+                break
+            time.sleep(0.01)
+        assert following.fetched
+        iterator.close()
+
+    def test_prefetch_error(self, first, pages, http):
+        http.register_uri('GET', uri_of(pages[3]), status=500)
+        iterator = first.iter_pages(prefetch=2)
+        with pytest.raises(exc.HALNavigatorError):
+            list(iterator)
+
+    def test_release_previous_pages(self, first, pages):
+        core = first._core
+        seen = []
+        for nav in first.iter_pages(release=True):
+            assert nav.fetched
+            for earlier in seen:
+                assert earlier.state is None
+                assert earlier.response is None
+                assert not earlier._links
+                assert earlier.uri not in core.response_cache
+            seen.append(nav)
+        assert len(seen) == len(pages)
+
+    def test_release_with_prefetch(self, first, pages):
+        navs = []
+        for nav in first.iter_pages(prefetch=2, release=True):
+            navs.append((nav.uri, nav.state['number']))
+        assert navs == [(uri_of(doc), doc['number']) for doc in pages]
+
+    def test_released_page_refetches(self, first, pages):
+        first.fetch()
+        first.release()
+        assert not first.resolved
+        assert first()['number'] == 0
+
+
+class TestStateViews:
+    '''tests for read-only views of navigator state'''
+
+    @pytest.fixture
+    def doc(self, page):
+        return page('viewed', 0)
+
+    def test_view_is_read_only(self, N, doc):
+        nav = N._core.nav_class(HN.Link(uri_of(doc)), N._core)
+        view = nav(copy=False)
+        assert view['name'] == 'viewed'
+        with pytest.raises(TypeError):
+            view['name'] = 'changed'
+
+    def test_view_is_not_a_copy(self, N, doc):
+        nav = N._core.nav_class(HN.Link(uri_of(doc)), N._core)
+        view = nav.fetch(copy=False)
+        nav.state['added'] = True
+        assert view['added']
+
+    def test_copy_is_mutable(self, N, doc):
+        nav = N._core.nav_class(HN.Link(uri_of(doc)), N._core)
+        state = nav()
+        state['name'] = 'changed'
+        assert nav.state['name'] == 'viewed'
+
+
+class TestJSONBackend:
+    '''tests for pluggable json libraries'''
+
+    @pytest.fixture
+    def backend(self):
+        calls = []
+        def loads(content):
+            calls.append('loads')
+            return json.loads(content)
+        def dumps(obj):
+            calls.append('dumps')
+            return json.dumps(obj, separators=(',', ':'))
+        backend = json_backends.JSONBackend('counting', loads, dumps)
+        backend.calls = calls
+        return backend
+
+    def test_decodes_with_backend(self, index_uri, index_page, backend):
+        N = RN.Navigator.hal(index_uri, json_backend=backend)
+        assert N()['data'] == index_page['data']
+        assert backend.calls == ['loads']
+
+    def test_encodes_with_backend(self, index_uri, page, backend, http):
+        doc = page('encoded', 0)
+        register_hal_page(doc, method='POST', status=201,
+                          location=uri_of(doc))
+        N = RN.Navigator.hal(uri_of(doc), json_backend=backend)
+        N.create({'name': 'foo'})
+        assert http.last_request.body == b'{"name":"foo"}'
+        assert http.last_request.headers['Content-Type'] == 'application/json'
+        assert backend.calls == ['dumps']
+
+    def test_not_json(self, index_uri, http, backend):
+        http.register_uri('GET', index_uri, body='not json',
+                          content_type='application/hal+json')
+        N = RN.Navigator.hal(index_uri, json_backend=backend)
+        with pytest.raises(exc.UnexpectedlyNotJSON):
+            N()
+
+    def test_get_backend(self):
+        assert json_backends.get_backend().name == 'json'
+        assert json_backends.get_backend('auto').name in \
+            json_backends.BACKENDS
+        with pytest.raises(ValueError):
+            json_backends.get_backend('nosuchjson')
+
+
+class TestResponseContent:
+    '''tests for decoding response bodies from bytes'''
+
+    @pytest.fixture
+    def doc(self, index_uri):
+        return {'_links': {'self': {'href': index_uri + 'bytes'}},
+                'name': u'Köln'}
+
+    @pytest.mark.parametrize('content_type', [
+        'application/hal+json',
+        'application/hal+json; charset=utf-8',
+    ])
+    def test_utf8_from_bytes(self, doc, http, content_type):
+        http.register_uri('GET', uri_of(doc),
+                          body=json.dumps(doc, ensure_ascii=False),
+                          content_type=content_type)
+        N = RN.Navigator.hal(uri_of(doc))
+        assert N()['name'] == u'Köln'
+        assert isinstance(N._response_content(N.response), bytes)
+
+    def test_declared_charset(self, doc, http):
+        http.register_uri('GET', uri_of(doc),
+                          body=json.dumps(doc, ensure_ascii=False)
+                          .encode('iso-8859-1'),
+                          content_type='application/json; charset=iso-8859-1')
+        N = RN.Navigator.hal(uri_of(doc))
+        assert N()['name'] == u'Köln'
+
+    def test_utf16_with_utf8_backend(self, doc, http):
+        http.register_uri('GET', uri_of(doc),
+                          body=json.dumps(doc, ensure_ascii=False)
+                          .encode('utf-16'),
+                          content_type='application/json; charset=utf-16')
+        def loads(content):
+            # Like orjson and ujson, only decodes utf-8 bytes
+            if isinstance(content, bytes):
+                content = content.decode('utf-8')
+            return json.loads(content)
+        backend = json_backends.JSONBackend('utf8only', loads, json.dumps)
+        N = RN.Navigator.hal(uri_of(doc), json_backend=backend)
+        assert N()['name'] == u'Köln'
+        assert not isinstance(N._response_content(N.response), bytes)
+
+    def test_utf16_from_bytes(self, doc, http):
+        http.register_uri('GET', uri_of(doc),
+                          body=json.dumps(doc, ensure_ascii=False)
+                          .encode('utf-16'),
+                          content_type='application/json; charset=utf-16')
+        N = RN.Navigator.hal(uri_of(doc))
+        assert N()['name'] == u'Köln'
+        assert isinstance(N._response_content(N.response), bytes)
+
+
+class TestStreamEmbedded:
+    '''tests for streaming embedded collections'''
+
+    @pytest.fixture
+    def collection(self, index_uri, http):
+        items = [{'_links': {'self': {'href': index_uri + 'items/' + str(i)}},
+                  'number': i} for i in range(50)]
+        items.append({'number': 'orphan'})
+        doc = {
+            '_links': {'self': {'href': index_uri + 'items'}},
+            '_embedded': {'xx:items': items, 'other': [{'number': -1}]},
+            'total': len(items),
+        }
+        register_hal_page(doc)
+        return doc
+
+    def test_yields_embedded_navigators(self, collection, index_uri):
+        N = RN.Navigator.hal(uri_of(collection), default_curie='xx')
+        navs = list(N.stream_embedded('items', chunk_size=16))
+        assert len(navs) == 51
+        assert navs[3].uri == index_uri + 'items/3'
+        assert navs[3].state == {'number': 3}
+        assert navs[3].self.rel == 'items'
+        assert navs[-1].parent is N
+        assert not N.resolved
+
+    def test_explicit_curie(self, collection):
+        N = RN.Navigator.hal(uri_of(collection))
+        numbers = [nav.state['number'] for nav in N.stream_embedded('xx:items')]
+        assert numbers[:3] == [0, 1, 2]
+
+    def test_missing_rel(self, collection):
+        N = RN.Navigator.hal(uri_of(collection))
+        assert list(N.stream_embedded('nothere')) == []
+
+    def test_error_status(self, index_uri, http):
+        http.register_uri('GET', index_uri + 'broken', status=500)
+        N = RN.Navigator.hal(index_uri + 'broken')
+        with pytest.raises(exc.HALNavigatorError):
+            list(N.stream_embedded('items'))
+
+
+class TestIdentityMap:
+    '''tests for the identity map policies of the api'''
+
+    def test_weak_by_default(self, index_uri):
+        N = RN.Navigator.hal(index_uri)
+        assert isinstance(N._core.id_map, cache.WeakIdentityMap)
+
+    def test_lru_keeps_unreferenced(self, page, http):
+        doc = page('kept', 0)
+        N = RN.Navigator.hal(
+            uri_of(doc), id_map=cache.LRUIdentityMap(maxsize=10))
+        core = N._core
+        del N
+        gc.collect()
+        N2 = HN.HALNavigator(HN.Link(uri_of(doc)), core)
+        assert core.stats()['id_map']['hits'] >= 1
+        assert core.get_cached(uri_of(doc)) is N2
+
+    def test_evicted_navigator_replaced(self, page):
+        doc = page('evicted', 0)
+        N = RN.Navigator.hal(
+            uri_of(doc), id_map=cache.LRUIdentityMap(maxsize=1))
+        N2 = HN.HALNavigator(HN.Link(uri_of(doc) + '/other'), N._core)
+        N3 = HN.HALNavigator(HN.Link(uri_of(doc)), N._core)
+        assert N3 is not N
+        assert N3.uri == N.uri
+        assert not N3.resolved
+        assert N._core.stats()['id_map']['evictions'] == 2
+
+    def test_is_cached_override(self, index_uri):
+        class UncachedCore(HN.APICore):
+            def is_cached(self, link):
+                return False
+        core = UncachedCore(index_uri, HN.HALNavigator)
+        N = HN.HALNavigator(HN.Link(index_uri), core)
+        assert core.get_cached(index_uri) is N
+        assert HN.HALNavigator(HN.Link(index_uri), core) is not N
+        default_core = HN.APICore(index_uri, HN.HALNavigator)
+        N = HN.HALNavigator(HN.Link(index_uri), default_core)
+        assert HN.HALNavigator(HN.Link(index_uri), default_core) is N
+        default_core.is_cached = lambda link: False
+        assert HN.HALNavigator(HN.Link(index_uri), default_core) is not N
+
+
+class TestPersistentCache:
+    '''tests for responses stored on disk across apis'''
+
+    @pytest.fixture
+    def etag_page(self, index_uri, http):
+        doc = {
+            '_links': {
+                'self': {'href': index_uri + 'stored'},
+                'next': {'href': index_uri + 'stored/2'},
+            },
+            'name': 'stored',
+        }
+        def body_callback(request, url, headers):
+            headers['ETag'] = '"v1"'
+            if request.headers.get('If-None-Match') == '"v1"':
+                return 304, headers, ''
+            return 200, headers, json.dumps(doc)
+        http.register_uri(
+            'GET',
+            body=body_callback,
+            content_type='application/hal+json',
+            uri=uri_of(doc),
+        )
+        return doc
+
+    def test_warm_start(self, etag_page, tmpdir, http):
+        path = str(tmpdir.join('cache.db'))
+        N = RN.Navigator.hal(uri_of(etag_page), cache_path=path)
+        N.fetch()
+        N._core.response_cache.close()
+
+        requests_made = len(http.latest_requests)
+        N2 = RN.Navigator.hal(uri_of(etag_page), cache_path=path)
+        assert N2.fetch() == {'name': 'stored'}
+        assert N2['next'].uri == etag_page['_links']['next']['href']
+        rc = N2._core.response_cache
+        rc.close()  # waits for the background revalidation
+        assert len(http.latest_requests) == requests_made + 1
+        assert http.last_request.headers['If-None-Match'] == '"v1"'
+        assert rc.background_revalidations == 1
+
+    def test_revalidate_before_use(self, etag_page, tmpdir, http):
+        path = str(tmpdir.join('cache.db'))
+        N = RN.Navigator.hal(uri_of(etag_page), cache_path=path)
+        N.fetch()
+        N._core.response_cache.close()
+
+        N2 = HN.HALNavigator(HN.Link(uri_of(etag_page)), HN.APICore(
+            root=uri_of(etag_page),
+            nav_class=HN.HALNavigator,
+            response_cache=cache.SQLiteResponseCache(
+                path, revalidate_in_background=False),
+        ))
+        N2.headers.update(HN.DEFAULT_HEADERS)
+        assert N2.fetch() == {'name': 'stored'}
+        assert N2.status == (304, 'Not Modified')
+        assert 'next' in N2
+
+    def test_release_keeps_stored(self, etag_page, tmpdir):
+        path = str(tmpdir.join('cache.db'))
+        N = RN.Navigator.hal(uri_of(etag_page), cache_path=path)
+        N.fetch()
+        N.release()
+        assert N._core.response_cache.stats()['stored'] == 1
+
+
+class TestListeners:
+    '''tests for the request lifecycle events of the api'''
+
+    @pytest.fixture
+    def events(self):
+        return []
+
+    @pytest.fixture
+    def N(self, page, events):
+        doc = page('listened', 0)
+        page('listened', 1)
+        N = RN.Navigator.hal(uri_of(doc))
+        for event in HN.APICore.EVENTS:
+            N._core.add_listener(
+                event, lambda info, event=event: events.append(
+                    (event, dict(info))))
+        return N
+
+    def test_events(self, N, events):
+        N['next']()
+        assert [event for event, _ in events] == [
+            'on_request_start', 'on_response', 'on_ingest_done',
+            'on_request_start', 'on_response', 'on_ingest_done',
+        ]
+        start, response, ingested = [info for _, info in events[3:]]
+        assert start['uri'] == N['next'].uri
+        assert start['rel'] == 'next'
+        assert start['method'] == 'GET'
+        assert response['status'] == 200
+        assert response['bytes'] > 0
+        assert response['total'] >= response['wait'] >= 0
+        assert ingested['parse'] >= 0
+        assert ingested['build'] >= 0
+        assert ingested['ingest'] >= ingested['parse']
+
+    def test_error(self, N, events, index_uri, http):
+        http.register_uri('GET', index_uri + 'broken', status=500)
+        nav = HN.HALNavigator(HN.Link(index_uri + 'broken'), N._core)
+        with pytest.raises(exc.HALNavigatorError):
+            nav()
+        event, info = events[-1]
+        assert event == 'on_error'
+        assert info['status'] == 500
+        assert isinstance(info['exception'], exc.HALNavigatorError)
+
+    def test_remove_listener(self, N, events):
+        for event in HN.APICore.EVENTS:
+            for listener in list(N._core.listeners.get(event, ())):
+                N._core.remove_listener(event, listener)
+        assert N._core.listeners == {}
+        N()
+        assert events == []
+
+    def test_unknown_event(self, N):
+        with pytest.raises(ValueError):
+            N._core.add_listener('on_nothing', lambda info: None)
+
+    def test_throttle_and_retry_timed(self, index_uri, http, events):
+        http.register_uri(
+            'GET', index_uri + 'timed',
+            responses=[
+                httpretty.Response(body='busy', status=503),
+                httpretty.Response(
+                    body='slow down', status=429,
+                    adding_headers={'Retry-After': '0.2'}),
+                httpretty.Response(
+                    body=json.dumps({'_links': {}}),
+                    content_type='application/hal+json'),
+            ])
+        N = RN.Navigator.hal(
+            index_uri + 'timed', rate_limiter=ratelimit.RateLimiter(),
+            retry_policy=retry.RetryPolicy(backoff=0.1))
+        N._core.add_listener('on_response', events.append)
+        N()
+        info, = events
+        assert info['status'] == 200
+        assert info['throttle'] >= 0.15
+        assert info['retry'] > 0
+        assert info['download'] < 0.1
+        assert info['total'] >= info['throttle'] + info['retry']
+
+
+class TestRateLimiter:
+    '''tests for throttling the requests of an api'''
+
+    def test_waits_on_retry_after(self, index_uri, http):
+        http.register_uri(
+            'GET', index_uri + 'limited',
+            responses=[
+                httpretty.Response(
+                    body='slow down', status=429,
+                    adding_headers={'Retry-After': '0'}),
+                httpretty.Response(
+                    body=json.dumps({'_links': {}, 'ok': True}),
+                    content_type='application/hal+json'),
+            ])
+        N = RN.Navigator.hal(
+            index_uri + 'limited', rate_limiter=ratelimit.RateLimiter())
+        assert N() == {'ok': True}
+        assert N._core.stats()['rate_limiter']['retried_after'] == 1
+
+    def test_without_limiter(self, index_uri, http):
+        http.register_uri(
+            'GET', index_uri + 'limited', body='slow down', status=429,
+            adding_headers={'Retry-After': '0'})
+        N = RN.Navigator.hal(index_uri + 'limited')
+        with pytest.raises(exc.HALNavigatorError):
+            N()
+
+    def test_throttles(self, page, http):
+        doc = page('throttled', 0)
+        N = RN.Navigator.hal(
+            uri_of(doc), rate_limiter=ratelimit.RateLimiter(rate=10))
+        for _ in range(3):
+            N.fetch(use_cache=False)
+        assert N._core.stats()['rate_limiter']['throttled'] >= 1
+
+
+class TestSingleFlight:
+    '''tests for coalescing concurrent fetches of the same uri'''
+
+    @pytest.fixture
+    def slow_uri(self, index_uri, http):
+        requests = []
+
+        def body(request, url, headers):
+            requests.append(url)
+            time.sleep(0.2)
+            return 200, headers, json.dumps(
+                {'_links': {'self': {'href': url}}, 'value': 42})
+        uri = index_uri + 'slow'
+        http.register_uri('GET', uri, body=body,
+                          content_type='application/hal+json')
+        return uri, requests
+
+    def fetch_concurrently(self, navs):
+        states = []
+        threads = [
+            threading.Thread(target=lambda nav=nav: states.append(nav()))
+            for nav in navs
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return states
+
+    def test_same_navigator(self, slow_uri):
+        uri, requests = slow_uri
+        N = RN.Navigator.hal(uri)
+        states = self.fetch_concurrently([N] * 4)
+        assert len(requests) == 1
+        assert states == [{'value': 42}] * 4
+        assert N._core.stats()['coalesced'] == 3
+
+    def test_distinct_navigators(self, slow_uri):
+        uri, requests = slow_uri
+        N = RN.Navigator.hal(uri, id_map=cache.LRUIdentityMap(maxsize=0))
+        navs = [N] + [HN.HALNavigator(HN.Link(uri), N._core)
+                      for _ in range(3)]
+        assert len(set(map(id, navs))) == 4
+        states = self.fetch_concurrently(navs)
+        assert len(requests) == 1
+        assert states == [{'value': 42}] * 4
+        for nav in navs:
+            assert nav.response.status_code == 200
+            assert nav.self.uri == uri
+
+    def test_disabled(self, slow_uri):
+        uri, requests = slow_uri
+        N = RN.Navigator.hal(uri, coalesce=False)
+        self.fetch_concurrently([N] * 2)
+        assert len(requests) == 2
+        assert 'coalesced' not in N._core.stats()
+
+    def test_error_raised_for_each_caller(self, index_uri, http):
+        def body(request, url, headers):
+            time.sleep(0.2)
+            return 404, headers, 'missing'
+        http.register_uri('GET', index_uri + 'missing', body=body)
+        N = RN.Navigator.hal(index_uri + 'missing')
+        errors = []
+
+        def fetch():
+            try:
+                N()
+            except exc.HALNavigatorError as e:
+                errors.append(e.status)
+        threads = [threading.Thread(target=fetch) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == [404] * 3
@@ -0,0 +1,63 @@
+'''Tests for restnavigator.ratelimit'''
+
+import pytest
+import requests
+
+from restnavigator import ratelimit
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: now[0])
+    return now
+
+
+def make_response(status, **headers):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return response
+
+
+def test_TokenBucket__burst_then_rate(clock):
+    bucket = ratelimit.TokenBucket(rate=10, burst=2)
+    delays = [bucket.reserve(1000.0) for _ in range(4)]
+    assert delays == [0.0, 0.0, pytest.approx(0.1), pytest.approx(0.2)]
+    # Refills over time
+    assert bucket.reserve(1001.0) == 0.0
+
+
+@pytest.mark.parametrize('status, headers, expected', [
+    (429, {'Retry-After': '3'}, 3.0),
+    (503, {'Retry-After': 'Thu, 01 Jan 1970 00:16:50 GMT'}, 10.0),
+    (429, {}, None),
+    (500, {'Retry-After': '3'}, None),
+    (429, {'Retry-After': 'soon'}, None),
+])
+def test_retry_after(clock, status, headers, expected):
+    assert ratelimit.retry_after(make_response(status, **headers)) == expected
+
+
+def test_RateLimiter__per_host(clock):
+    limiter = ratelimit.RateLimiter(rate=1, burst=1)
+    assert limiter.reserve('http://a.example/1') == 0
+    assert limiter.reserve('http://b.example/1') == 0
+    assert limiter.reserve('http://a.example/2') == pytest.approx(1.0)
+    assert limiter.stats()['throttled'] == 1
+
+
+def test_RateLimiter__retry_delay_blocks_host(clock):
+    limiter = ratelimit.RateLimiter(max_retries=1, max_wait=5)
+    response = make_response(429, **{'Retry-After': '2'})
+    assert limiter.retry_delay('http://a.example/', response, 0) == 2
+    assert limiter.reserve('http://a.example/other') == pytest.approx(2)
+    assert limiter.reserve('http://b.example/') == 0
+    # Out of retries
+    assert limiter.retry_delay('http://a.example/', response, 1) is None
+
+
+def test_RateLimiter__max_wait(clock):
+    limiter = ratelimit.RateLimiter(max_wait=5)
+    response = make_response(503, **{'Retry-After': '60'})
+    assert limiter.retry_delay('http://a.example/', response, 0) is None
@@ -0,0 +1,115 @@
+'''Tests for restnavigator.retry'''
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import restnavigator as RN
+from restnavigator import cassette, retry
+
+
+def make_response(status, **headers):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return response
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    # No jitter, so delays are predictable
+    monkeypatch.setattr(retry.random, 'uniform', lambda low, high: high)
+    return retry.RetryPolicy(
+        max_attempts=3, backoff=1, max_backoff=1.5, max_elapsed=100)
+
+
+def test_backoff(policy):
+    started = retry.time.time()
+    assert policy.delay_after_error(
+        'GET', requests.ConnectionError(), 0, started) == 1
+    assert policy.delay_after_response(
+        'GET', make_response(503), 1, started) == 1.5
+    # Out of attempts
+    assert policy.delay_after_response(
+        'GET', make_response(503), 2, started) is None
+    assert policy.stats() == {
+        'retries': 2,
+        'retried_errors': 1,
+        'retried_statuses': 1,
+        'gave_up': 1,
+    }
+
+
+def test_not_retried(policy):
+    started = retry.time.time()
+    assert policy.delay_after_response(
+        'GET', make_response(500), 0, started) is None
+    assert policy.delay_after_error(
+        'GET', ValueError(), 0, started) is None
+    assert policy.delay_after_response(
+        'POST', make_response(503), 0, started) is None
+
+
+def test_unsafe_methods_opt_in(policy):
+    policy = retry.RetryPolicy(unsafe_methods=['post'])
+    assert policy.delay_after_response(
+        'POST', make_response(503), 0, retry.time.time()) is not None
+
+
+def test_max_elapsed(policy):
+    assert policy.delay_after_response(
+        'GET', make_response(503), 0, retry.time.time() - 100) is None
+
+
+def test_retry_after_honoured(policy):
+    assert policy.delay_after_response(
+        'GET', make_response(503, **{'Retry-After': '5'}), 0,
+        retry.time.time()) == 5
+
+
+class FlakyAdapter(BaseAdapter):
+    '''Fails with a connection error a number of times, then replays'''
+
+    def __init__(self, failures, replay):
+        super(FlakyAdapter, self).__init__()
+        self.failures = failures
+        self.replay = replay
+
+    def send(self, request, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise requests.ConnectionError('connection reset')
+        return self.replay.send(request, **kwargs)
+
+    def close(self):
+        pass
+
+
+def interactions(uri, *statuses):
+    return [
+        {'request': {'method': 'GET', 'uri': uri},
+         'response': {'status': status, 'body': '{"n": 1}',
+                      'headers': {'Content-Type': 'application/hal+json'}}}
+        for status in statuses
+    ]
+
+
+def test_navigator_retries(policy, monkeypatch):
+    monkeypatch.setattr(retry.time, 'sleep', lambda seconds: None)
+    uri = 'http://retry.example/api/'
+    session = requests.Session()
+    session.mount('http://', FlakyAdapter(
+        1, cassette.ReplayAdapter(interactions(uri, 502, 200))))
+    N = RN.Navigator.hal(uri, session=session, retry_policy=policy)
+    assert N() == {'n': 1}
+    assert N._core.stats()['retry_policy']['retries'] == 2
+
+
+def test_navigator_gives_up(policy):
+    uri = 'http://retry.example/api/'
+    session = requests.Session()
+    session.mount('http://', FlakyAdapter(5, None))
+    N = RN.Navigator.hal(uri, session=session, retry_policy=retry.RetryPolicy(
+        max_attempts=2, backoff=0))
+    with pytest.raises(requests.ConnectionError):
+        N()
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 
+import json
+import threading
+import time
+
 try:
     from collections import OrderedDict
 except ImportError:
@@ -165,6 +169,114 @@ def test_LinkList__init_iterator(linklist):
     # Non black-box test warning!
     assert ll_iterated._meta == ll_ctor._meta
 
+@pytest.fixture
+def fake_nav():
+    '''Returns a class of navigators that fetch without http'''
+    class FakeNav(object):
+        def __init__(self, state=None, error=None):
+            self.state = state
+            self.error = error
+            self.fetches = 0
+        @property
+        def resolved(self):
+            return self.fetches > 0
+        def __call__(self):
+            return self.state
+        def fetch(self, raise_exc=True):
+            self.fetches += 1
+            if self.error is not None:
+                raise self.error
+            return self.state
+    return FakeNav
+
+def test_LinkList__fetch_all(fake_nav):
+    navs = [fake_nav({'i': i}) for i in range(20)]
+    ll = RNU.LinkList((nav, {'name': str(i)}) for i, nav in enumerate(navs))
+    results = ll.fetch_all(max_workers=4)
+    assert [r.navigator for r in results] == navs
+    assert [r.state for r in results] == [{'i': i} for i in range(20)]
+    assert all(nav.fetches == 1 for nav in navs)
+
+def test_LinkList__fetch_all_failures(fake_nav):
+    error = ValueError('boom')
+    navs = [fake_nav({'i': 0}), fake_nav(error=error), fake_nav({'i': 2})]
+    results = RNU.LinkList((nav, {}) for nav in navs).fetch_all()
+    assert results[0].state == {'i': 0}
+    assert results[1].state is None
+    assert results[1].exception is error
+    assert results[2].exception is None
+
+def test_fetch_all__dedupes_and_skips_resolved(fake_nav):
+    nav, resolved = fake_nav({'a': 1}), fake_nav({'b': 2})
+    resolved.fetch()
+    results = RNU.fetch_all([nav, nav, resolved])
+    assert [r.state for r in results] == [{'a': 1}, {'a': 1}, {'b': 2}]
+    assert nav.fetches == 1
+    assert resolved.fetches == 1
+
+def test_CurieDict__fetch_all(fake_nav):
+    single, multi = fake_nav({'x': 1}), [fake_nav({'y': 1}), fake_nav({'y': 2})]
+    cd = RNU.CurieDict('xx', {
+        'xx:single': single,
+        'xx:multi': RNU.LinkList((nav, {}) for nav in multi),
+    })
+    results = cd.fetch_all()
+    assert results['single'].state == {'x': 1}
+    assert [r.state for r in results['xx:multi']] == [{'y': 1}, {'y': 2}]
+
+def test_LazyCurieDict__creates_on_access():
+    calls = []
+    def factory(key, raw):
+        calls.append(key)
+        return raw.upper()
+    lazy = RNU.LazyCurieDict('xx', {'xx:a': 'a', 'next': 'b'}, factory)
+    assert calls == []
+    assert 'a' in lazy and len(lazy) == 2
+    assert calls == []
+    assert lazy['a'] == 'A'
+    assert lazy['a'] == 'A'
+    assert calls == ['xx:a']
+    assert lazy.get('next') == 'B'
+    assert lazy == {'xx:a': 'A', 'next': 'B'}
+    assert dict(lazy) == {'xx:a': 'A', 'next': 'B'}
+    assert calls == ['xx:a', 'next']
+
+def test_LazyCurieDict__copy_with_default_curie():
+    lazy = RNU.LazyCurieDict(
+        'xx', {'foo': 1, 'xx:bar': 2, 'next': 3}, lambda k, v: v * 10)
+    assert dict(lazy) == {'foo': 10, 'xx:bar': 20, 'next': 30}
+    copied = {}
+    copied.update(lazy)
+    assert copied == {'foo': 10, 'xx:bar': 20, 'next': 30}
+    assert lazy['bar'] == 20
+
+def test_LazyCurieDict__bulk_access():
+    lazy = RNU.LazyCurieDict(None, {'a': 1, 'b': 2}, lambda k, v: v * 10)
+    assert sorted(lazy.values()) == [10, 20]
+    lazy['c'] = 3
+    assert sorted(lazy.items()) == [('a', 10), ('b', 20), ('c', 3)]
+
+def test_LazyList__creates_on_access():
+    calls = []
+    def factory(raw):
+        calls.append(raw)
+        return raw * 10
+    lazy = RNU.LazyList([1, 2, 3, 4], factory)
+    assert len(lazy) == 4
+    assert calls == []
+    assert lazy[-1] == 40
+    assert lazy[1:3] == [20, 30]
+    assert calls == [4, 2, 3]
+    assert list(lazy) == [10, 20, 30, 40]
+    assert calls == [4, 2, 3, 1]
+
+def test_LazyList__modification():
+    lazy = RNU.LazyList([1, 2], lambda raw: -raw)
+    lazy.append(3)
+    assert lazy == [-1, -2, 3]
+    with pytest.raises(IndexError):
+        lazy[3]
+
 @pytest.fixture
 def unhashable_prop():
     bad_value = ['bad_stuff']
@@ -228,4 +340,170 @@ def test_getstate(doc, expected):
 ])
 def test_getstate_failures(doc, exception):
     with pytest.raises(exception):
-        RNU.getstate(doc)
\ No newline at end of file
+        RNU.getstate(doc)
+
+@pytest.mark.parametrize("doc,expected", [
+    ({"_links": {}}, {}),
+    ({"_embedded": {}}, {}),
+    ({"_embedded": {}, "a": 1}, {"a": 1}),
+    ({"_links": [], "b": 2, "c": 3}, {"b": 2, "c": 3}),
+])
+def test_split_hal_state(doc, expected):
+    state, links, embedded = RNU.split_hal(doc)
+    assert state == expected == RNU.getstate(doc)
+
+
+def test_split_hal_no_copy():
+    nested = {'deep': [1, 2]}
+    links = {'self': {'href': '/'}}
+    embedded = {'item': {'a': 1}}
+    doc = {'_links': links, '_embedded': embedded, 'nested': nested}
+    state, split_links, split_embedded = RNU.split_hal(doc)
+    assert state is doc
+    assert state['nested'] is nested
+    assert split_links is links
+    assert split_embedded is embedded
+
+
+@pytest.mark.parametrize("doc", ["hiyas", 1, ["hams"]])
+def test_split_hal_failures(doc):
+    with pytest.raises(TypeError):
+        RNU.split_hal(doc)
+
+
+@pytest.mark.parametrize("media_type,expected", [
+    ('application/hal+json', None),
+    ('application/hal+json; charset=UTF-8', 'utf-8'),
+    ('application/json;profile="x";charset="iso-8859-1"', 'iso-8859-1'),
+    (None, None),
+])
+def test_media_type_charset(media_type, expected):
+    assert RNU.media_type_charset(media_type) == expected
+
+
+def _chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_iter_json_array(size):
+    doc = ('{"count": 12345, "_links": {"self": {"href": "/"}}, '
+           '"_embedded": {"other": [1, 2], "xx:items": '
+           '[{"a": 1}, {"b": [1, {"c": "}]"}]}, 67890, "str\\"ing"], '
+           '"more": {}}, "after": "not read"}')
+    items = list(RNU.iter_json_array(
+        _chunked(doc, size), ['_embedded', ('items', 'xx:items')]))
+    assert items == [{'a': 1}, {'b': [1, {'c': '}]'}]}, 67890, 'str"ing']
+
+
+@pytest.mark.parametrize("doc,expected", [
+    ('{}', []),
+    ('{"_embedded": {}}', []),
+    ('{"_embedded": {"items": []}}', []),
+    ('{"_embedded": {"items": {"single": true}}}', [{'single': True}]),
+    ('{"_embedded": null, "items": [1]}', []),
+])
+def test_iter_json_array_shapes(doc, expected):
+    items = RNU.iter_json_array(_chunked(doc, 2), ['_embedded', 'items'])
+    assert list(items) == expected
+
+
+def test_iter_json_array_large_values():
+    links = dict(('rel{0}'.format(i), {'href': '/a/"{0}\\'.format(i)})
+                 for i in range(5000))
+    items = [{'id': i, 'text': 'x\\"' * 500} for i in range(5)]
+    doc = json.dumps({'_links': links, 'count': 12.5, 'flag': True,
+                      '_embedded': {'items': items}})
+    chunks = _chunked(doc, 97)
+    stream = RNU._JSONStream(chunks)
+    largest = []
+
+    def tracked():
+        for chunk in chunks:
+            largest.append(len(stream.buf))
+            yield chunk
+    stream._chunks = tracked()
+    found = list(RNU._iter_json_path(
+        stream, [frozenset(['_embedded']), frozenset(['items'])]))
+    assert found == items
+    # The links are skipped without holding them in the buffer
+    assert len(doc) > 100000
+    assert max(largest) < RNU._JSONStream.COMPACT_AFTER + 2 * len(
+        json.dumps(items[0]))
+
+
+def test_iter_json_array_invalid():
+    with pytest.raises(ValueError):
+        list(RNU.iter_json_array(['{"_embedded": {"items": [1, '],
+                                 ['_embedded', 'items']))
+
+
+@pytest.mark.parametrize("skipped", [
+    'tru', '', 'nul', '01', '1.', '"a" x', '{"b": [1, fals]}', '[1, 2e]',
+    '{"b": true1}',
+])
+@pytest.mark.parametrize("size", [1, 1000])
+def test_iter_json_array_invalid_skipped(skipped, size):
+    doc = '{"a": ' + skipped + ', "_embedded": {"items": [1]}}'
+    with pytest.raises(ValueError):
+        list(RNU.iter_json_array(_chunked(doc, size), ['_embedded', 'items']))
+
+
+@pytest.mark.parametrize("size", [1, 1000])
+def test_iter_json_array_valid_skipped(size):
+    doc = ('{"a": true, "b": -0.5e+10, "c": [null, false, 0, 12], '
+           '"d": {"e": "tru", "f": 1E2}, "_embedded": {"items": [1]}}')
+    items = RNU.iter_json_array(_chunked(doc, size), ['_embedded', 'items'])
+    assert list(items) == [1]
+
+
+def test_single_flight():
+    flights = RNU.SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'result'
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            flights.do('key', slow)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(results) == [('result', False)] * 3 + [('result', True)]
+    assert flights.coalesced == 3
+    assert flights.do('key', lambda: 'again') == ('again', True)
+
+
+def test_single_flight_shares_exception():
+    flights = RNU.SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise KeyError('key')
+
+    def call():
+        try:
+            flights.do('key', fail)
+        except KeyError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    leader.join()
+    follower.join()
+    assert len(errors) == 2
+    assert flights.coalesced == 1